@@ -0,0 +1,109 @@
+#!/usr/bin/python
+
+# Copyright (c) Ontic. (http://www.ontic.com.au). All rights reserved.
+# See the COPYING file bundled with this package for license details.
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: kong_conf
+short_description: Manage the properties of a Kong config file
+description:
+  - Merges every option into the config file in a single pass and replaces the file atomically, so any
+    handlers are notified once when the effective config changes. Options are matched in the same way
+    as the `ini_file` module does, replacing an active setting or else its commented-out default.
+options:
+  path:
+    required: true
+    aliases:
+      - dest
+    description:
+      - The Kong config file, typically `/etc/kong/kong.conf`.
+  options:
+    required: true
+    description:
+      - A list of properties, each with an `option` name, a `value` and an optional `state` of `present`
+        or `absent`. Boolean values are written as `on` or `off`.
+  owner:
+    required: false
+    description:
+      - The name of the user that should own the file.
+  group:
+    required: false
+    description:
+      - The name of the group that should own the file.
+  mode:
+    required: false
+    description:
+      - The permissions the file should have.
+'''
+
+EXAMPLES = '''
+- name: Configure Kong
+  kong_conf:
+    path: /etc/kong/kong.conf
+    options:
+      - { option: 'database', value: 'postgres' }
+      - { option: 'pg_host', value: 'localhost' }
+      - { option: 'pg_ssl', value: 'off' }
+      - { option: 'anonymous_reports', state: 'absent' }
+    owner: root
+    group: root
+    mode: 0644
+  register: kong_conf
+
+- name: Debug Kong config
+  debug: var=kong_conf
+'''
+
+RETURN = '''
+message:
+  description: The outcome of merging the options
+  returned: always
+  type: str
+  sample: OK
+changes:
+  description: Every changed option along with its value `before` and `after` the change
+  returned: always
+  type: list
+config_digest:
+  description: The SHA-256 digest of the resulting config file
+  returned: always
+  type: str
+'''
+
+from ansible.module_utils.kong import KongConfigFile
+from ansible.module_utils.basic import AnsibleModule
+
+def main():
+
+    module_spec = {
+        'path': dict(required=True, default=None, type='path', aliases=['dest']),
+        'options': dict(required=True, default=None, type='list')
+    }
+
+    module = AnsibleModule(
+        argument_spec=module_spec,
+        add_file_common_args=True,
+        supports_check_mode=True
+    )
+
+    config = KongConfigFile(module)
+
+    try:
+        result = config.apply()
+    except ValueError as error:
+        result = {
+            'message': str(error),
+            'failed': True
+        }
+
+    module.exit_json(**result)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/python
+
+# Copyright (c) Ontic. (http://www.ontic.com.au). All rights reserved.
+# See the COPYING file bundled with this package for license details.
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: kong_credentials
+short_description: Manage Kong consumer credentials in bulk
+options:
+  admin_url:
+    required: false
+    default: http://localhost:8001
+    description:
+      - Kong admin URL in the form (http|https)://host.domain[:port]
+  admin_username:
+    required: false
+    description:
+      - Username used when Basic authentication is required to access the Kong Admin API.
+  admin_password:
+    required: false
+    description:
+      - Password used when Basic authentication is required to access the Kong Admin API.
+  action:
+    required: true
+    choices:
+      - create
+      - delete
+    description:
+      - An action to perform. If `create` any missing credentials will be created and any
+        credentials with differing fields will be updated. If `delete` the credentials will be removed.
+  credentials:
+    required: true
+    description:
+      - A list of credentials. Each item requires a `consumer` (a unique name or UUID used as the
+        consumer primary key), a `type` (one of `key-auth`, `basic-auth`, `jwt` or `acl`) and the
+        field identifying the credential for that type (`key`, `username`, `key` and `group`
+        respectively). Any other fields are sent to Kong as they are.
+  exclusive:
+    required: false
+    default: false
+    description:
+      - If `true` and the `action` field is set to `create`, existing credentials of a declared
+        type which are not declared for a given consumer will be removed.
+  concurrency:
+    required: false
+    default: 4
+    description:
+      - The maximum number of Admin API requests made in parallel.
+  rate_limit:
+    required: false
+    default: 0
+    description:
+      - The maximum number of Admin API requests per second, or `0` for no limit. The rate is
+        halved whenever Kong responds slowly or with a server error and recovers gradually.
+  max_in_flight:
+    required: false
+    default: 0
+    description:
+      - The maximum number of Admin API requests awaiting a response, or `0` for no limit. The
+        limit is halved whenever Kong responds slowly or with a server error and recovers gradually.
+  latency_threshold:
+    required: false
+    default: 0
+    description:
+      - The Admin API response time in milliseconds above which requests are slowed down,
+        or `0` to only slow down on server errors.
+'''
+
+EXAMPLES = '''
+- name: Create consumer credentials
+  kong_credentials:
+    credentials:
+      - { consumer: example-consumer, type: key-auth, key: SECRET_KEY }
+      - { consumer: example-consumer, type: basic-auth, username: adam, password: secret }
+      - { consumer: example-consumer, type: acl, group: admin }
+    action: create
+  register: credentials_create
+
+- name: Debug credentials create
+  debug: var=credentials_create
+
+- name: Delete consumer credentials
+  kong_credentials:
+    credentials:
+      - { consumer: example-consumer, type: acl, group: admin }
+    action: delete
+  register: credentials_delete
+
+- name: Debug credentials delete
+  debug: var=credentials_delete
+'''
+
+RETURN = '''
+message:
+  description: The overall outcome of the requests
+  returned: always
+  type: str
+  sample: OK
+response:
+  description: The number of credentials created, updated, deleted and unchanged along with any failed requests
+  returned: always
+  type: dic
+'''
+
+from ansible.module_utils.kong import KongCredentialApi
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.urls import url_argument_spec
+
+def main():
+
+    module_spec = {
+        'admin_url': dict(required=False, default='http://localhost:8001', type='str'),
+        'url_username': dict(required=False, default=None, type='str', aliases=['admin_username']),
+        'url_password': dict(required=False, default=None, type='str', aliases=['admin_password'], no_log=True),
+        'action': dict(required=True, default=None, type='str', choices=['create', 'delete']),
+        'credentials': dict(required=True, default=None, type='list', no_log=True),
+        'exclusive': dict(required=False, default=False, type='bool'),
+        'concurrency': dict(required=False, default=4, type='int'),
+        'rate_limit': dict(required=False, default=0, type='float'),
+        'max_in_flight': dict(required=False, default=0, type='int'),
+        'latency_threshold': dict(required=False, default=0, type='int')
+    }
+
+    argument_spec = url_argument_spec()
+    argument_spec.update(module_spec)
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True
+    )
+
+    try:
+        api = KongCredentialApi(module)
+
+        if api.action == 'create':
+            result = api.create()
+        elif api.action == 'delete':
+            result = api.delete()
+    except ValueError as error:
+        result = {
+            'message': str(error),
+            'failed': True
+        }
+
+    module.exit_json(**result)
+
+if __name__ == '__main__':
+    main()
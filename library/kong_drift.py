@@ -0,0 +1,172 @@
+#!/usr/bin/python
+
+# Copyright (c) Ontic. (http://www.ontic.com.au). All rights reserved.
+# See the COPYING file bundled with this package for license details.
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: kong_drift
+short_description: Report differences between Kong and a declared state
+description:
+  - Every compared collection is listed once, page by page, and compared against the declared
+    entities. Only the collections given, including any nested within their parent entities, are
+    compared. Nothing is ever written to the Admin API.
+options:
+  admin_url:
+    required: false
+    default: http://localhost:8001
+    description:
+      - Kong admin URL in the form (http|https)://host.domain[:port]
+  admin_username:
+    required: false
+    description:
+      - Username used when Basic authentication is required to access the Kong Admin API.
+  admin_password:
+    required: false
+    description:
+      - Password used when Basic authentication is required to access the Kong Admin API.
+  services:
+    required: false
+    description:
+      - A list of declared services, accepting the same fields as the `kong_service` module.
+        Each service may contain nested `routes` and `plugins` lists.
+  routes:
+    required: false
+    description:
+      - A list of declared routes, accepting the same fields as the `kong_route` module.
+        Each route may contain a nested `plugins` list.
+  consumers:
+    required: false
+    description:
+      - A list of declared consumers, accepting the same fields as the `kong_consumer` module.
+        Each consumer may contain a nested `plugins` list.
+  plugins:
+    required: false
+    description:
+      - A list of declared plugins, accepting the same fields as the `kong_plugin` module.
+  upstreams:
+    required: false
+    description:
+      - A list of declared upstreams, accepting the same fields as the `kong_upstream` module.
+        Each upstream may contain a nested `targets` list.
+  targets:
+    required: false
+    description:
+      - A list of declared targets, accepting the same fields as the `kong_target` module.
+  concurrency:
+    required: false
+    default: 4
+    description:
+      - The maximum number of collections listed in parallel.
+  rate_limit:
+    required: false
+    default: 0
+    description:
+      - The maximum number of Admin API requests per second, or `0` for no limit. The rate is
+        halved whenever Kong responds slowly or with a server error and recovers gradually.
+  max_in_flight:
+    required: false
+    default: 0
+    description:
+      - The maximum number of Admin API requests awaiting a response, or `0` for no limit. The
+        limit is halved whenever Kong responds slowly or with a server error and recovers gradually.
+  latency_threshold:
+    required: false
+    default: 0
+    description:
+      - The Admin API response time in milliseconds above which requests are slowed down,
+        or `0` to only slow down on server errors.
+'''
+
+EXAMPLES = '''
+- name: Detect drift
+  kong_drift:
+    services:
+      - id: example-service
+        name: example-service
+        url: http://mockbin.org/request
+        routes:
+          - id: example-route
+            hosts: example.com
+    consumers:
+      - id: example-consumer
+        username: adam
+        custom_id: 1234
+    plugins:
+      - id: example-plugin
+        name: key-auth
+        enabled: true
+  register: drift
+
+- name: Debug drift
+  debug: var=drift
+'''
+
+RETURN = '''
+message:
+  description: Whether drift was detected
+  returned: always
+  type: str
+  sample: OK
+drift:
+  description: True if any compared collection differs from the declared state
+  returned: always
+  type: bool
+response:
+  description: For every compared collection, the entities `added` outside of the declared state or declared
+    as absent, the declared entities `removed` from Kong, the `modified` entities along with their differing
+    fields, and the `total` number of entities in Kong
+  returned: always
+  type: dic
+'''
+
+from ansible.module_utils.kong import KongDriftApi
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.urls import url_argument_spec
+
+def main():
+
+    module_spec = {
+        'admin_url': dict(required=False, default='http://localhost:8001', type='str'),
+        'url_username': dict(required=False, default=None, type='str', aliases=['admin_username']),
+        'url_password': dict(required=False, default=None, type='str', aliases=['admin_password'], no_log=True),
+        'services': dict(required=False, default=None, type='list'),
+        'routes': dict(required=False, default=None, type='list'),
+        'consumers': dict(required=False, default=None, type='list'),
+        'plugins': dict(required=False, default=None, type='list'),
+        'upstreams': dict(required=False, default=None, type='list'),
+        'targets': dict(required=False, default=None, type='list'),
+        'concurrency': dict(required=False, default=4, type='int'),
+        'rate_limit': dict(required=False, default=0, type='float'),
+        'max_in_flight': dict(required=False, default=0, type='int'),
+        'latency_threshold': dict(required=False, default=0, type='int')
+    }
+
+    argument_spec = url_argument_spec()
+    argument_spec.update(module_spec)
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True
+    )
+
+    api = KongDriftApi(module)
+
+    try:
+        result = api.drift()
+    except ValueError as error:
+        result = {
+            'message': str(error),
+            'failed': True
+        }
+
+    module.exit_json(**result)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/python
+
+# Copyright (c) Ontic. (http://www.ontic.com.au). All rights reserved.
+# See the COPYING file bundled with this package for license details.
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: kong_export
+short_description: Export Kong entities to a snapshot file
+description:
+  - Every collection is listed page by page and written, sorted by identifier, to a gzip compressed
+    JSON lines file. The first line is a header containing the number of entities in each collection
+    and the line on which each collection starts. Only a summary is returned.
+options:
+  admin_url:
+    required: false
+    default: http://localhost:8001
+    description:
+      - Kong admin URL in the form (http|https)://host.domain[:port]
+  admin_username:
+    required: false
+    description:
+      - Username used when Basic authentication is required to access the Kong Admin API.
+  admin_password:
+    required: false
+    description:
+      - Password used when Basic authentication is required to access the Kong Admin API.
+  path:
+    required: true
+    description:
+      - The snapshot file to write on the host executing the module.
+  collections:
+    required: false
+    default: [services, routes, consumers, plugins, upstreams, targets]
+    description:
+      - The collections to export.
+  concurrency:
+    required: false
+    default: 4
+    description:
+      - The maximum number of collections listed in parallel.
+  rate_limit:
+    required: false
+    default: 0
+    description:
+      - The maximum number of Admin API requests per second, or `0` for no limit. The rate is
+        halved whenever Kong responds slowly or with a server error and recovers gradually.
+  max_in_flight:
+    required: false
+    default: 0
+    description:
+      - The maximum number of Admin API requests awaiting a response, or `0` for no limit. The
+        limit is halved whenever Kong responds slowly or with a server error and recovers gradually.
+  latency_threshold:
+    required: false
+    default: 0
+    description:
+      - The Admin API response time in milliseconds above which requests are slowed down,
+        or `0` to only slow down on server errors.
+'''
+
+EXAMPLES = '''
+- name: Export Kong
+  kong_export:
+    path: /var/backups/kong.jsonl.gz
+  register: export
+
+- name: Debug export
+  debug: var=export
+'''
+
+RETURN = '''
+message:
+  description: The outcome of the export
+  returned: always
+  type: str
+  sample: OK
+response:
+  description: The snapshot path, the number of entities exported per collection, the size of the snapshot
+    in bytes and its sha256 checksum
+  returned: always
+  type: dic
+'''
+
+from ansible.module_utils.kong import KongExportApi
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.urls import url_argument_spec
+
+def main():
+
+    module_spec = {
+        'admin_url': dict(required=False, default='http://localhost:8001', type='str'),
+        'url_username': dict(required=False, default=None, type='str', aliases=['admin_username']),
+        'url_password': dict(required=False, default=None, type='str', aliases=['admin_password'], no_log=True),
+        'path': dict(required=True, default=None, type='path'),
+        'collections': dict(required=False, default=['services', 'routes', 'consumers', 'plugins', 'upstreams', 'targets'], type='list'),
+        'concurrency': dict(required=False, default=4, type='int'),
+        'rate_limit': dict(required=False, default=0, type='float'),
+        'max_in_flight': dict(required=False, default=0, type='int'),
+        'latency_threshold': dict(required=False, default=0, type='int')
+    }
+
+    argument_spec = url_argument_spec()
+    argument_spec.update(module_spec)
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True
+    )
+
+    api = KongExportApi(module)
+
+    try:
+        result = api.export()
+    except ValueError as error:
+        result = {
+            'message': str(error),
+            'failed': True
+        }
+
+    module.exit_json(**result)
+
+if __name__ == '__main__':
+    main()
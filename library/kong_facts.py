@@ -0,0 +1,137 @@
+#!/usr/bin/python
+
+# Copyright (c) Ontic. (http://www.ontic.com.au). All rights reserved.
+# See the COPYING file bundled with this package for license details.
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: kong_facts
+short_description: Gather facts about a Kong installation
+description:
+  - Collects the installed version, whether the prefix is prepared, whether Kong is running, the config
+    digests and the Admin API node information in a single invocation. The Kong CLI is only started when
+    the version cannot be read from the installed Lua sources, and the Admin API is only requested when
+    Kong is running.
+  - The role uses the `installed`, `version`, `prepared` and `running` facts to skip installation,
+    preparation and migrations. The digests, the reachability and the node information are informational.
+options:
+  admin_url:
+    required: false
+    default: http://localhost:8001
+    description:
+      - Kong admin URL in the form (http|https)://host.domain[:port]
+  admin_username:
+    required: false
+    description:
+      - Username used when Basic authentication is required to access the Kong Admin API.
+  admin_password:
+    required: false
+    description:
+      - Password used when Basic authentication is required to access the Kong Admin API.
+  binary_file:
+    required: false
+    default: /usr/local/bin/kong
+    description:
+      - The Kong CLI, used to determine the version when the `meta_file` cannot be read.
+  meta_file:
+    required: false
+    default: /usr/local/share/lua/5.1/kong/meta.lua
+    description:
+      - The Lua source file defining the installed Kong version.
+  prefix_path:
+    required: false
+    default: /usr/local/kong
+    description:
+      - The Kong prefix directory containing the nginx PID file.
+  config_file:
+    required: false
+    default: /etc/kong/kong.conf
+    description:
+      - The Kong config file to digest.
+  nginx_config_file:
+    required: false
+    description:
+      - The custom Nginx config template to digest.
+  instances:
+    required: false
+    description:
+      - Further Kong instances running on the same host, each a dictionary with a `name`, a `prefix_path`
+        and optionally a `config_file` and `nginx_config_file`. Their prepared and running state and their
+        digests are collected from disk only.
+'''
+
+EXAMPLES = '''
+- name: Gather Kong facts
+  kong_facts:
+    prefix_path: /usr/local/kong
+    config_file: /etc/kong/kong.conf
+
+- name: Debug Kong facts
+  debug: var=kong_facts
+
+- name: Gather Kong facts for two instances
+  kong_facts:
+    prefix_path: /usr/local/kong-a
+    config_file: /etc/kong/kong-a.conf
+    instances:
+      - { name: a, prefix_path: /usr/local/kong-a, config_file: /etc/kong/kong-a.conf }
+      - { name: b, prefix_path: /usr/local/kong-b, config_file: /etc/kong/kong-b.conf }
+'''
+
+RETURN = '''
+ansible_facts:
+  description: A `kong_facts` dictionary containing whether Kong is `installed` and its `version`, whether the prefix
+    is `prepared`, whether Kong is `running` and its `pid`, the SHA-256 `config_digest` and `nginx_config_digest`,
+    whether the Admin API and the database are reachable (`admin_reachable` and `database_reachable`) and the
+    `node` information and server status reported by the Admin API, along with the `instances` facts
+    keyed by instance name
+  returned: always
+  type: dic
+'''
+
+from ansible.module_utils.kong import KongFactsApi
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.urls import url_argument_spec
+
+def main():
+
+    module_spec = {
+        'admin_url': dict(required=False, default='http://localhost:8001', type='str'),
+        'url_username': dict(required=False, default=None, type='str', aliases=['admin_username']),
+        'url_password': dict(required=False, default=None, type='str', aliases=['admin_password'], no_log=True),
+        'binary_file': dict(required=False, default='/usr/local/bin/kong', type='path'),
+        'meta_file': dict(required=False, default='/usr/local/share/lua/5.1/kong/meta.lua', type='path'),
+        'prefix_path': dict(required=False, default='/usr/local/kong', type='path'),
+        'config_file': dict(required=False, default='/etc/kong/kong.conf', type='path'),
+        'nginx_config_file': dict(required=False, default=None, type='path'),
+        'instances': dict(required=False, default=None, type='list')
+    }
+
+    argument_spec = url_argument_spec()
+    argument_spec.update(module_spec)
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True
+    )
+
+    api = KongFactsApi(module)
+
+    try:
+        result = api.facts()
+    except ValueError as error:
+        result = {
+            'message': str(error),
+            'failed': True
+        }
+
+    module.exit_json(**result)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+
+# Copyright (c) Ontic. (http://www.ontic.com.au). All rights reserved.
+# See the COPYING file bundled with this package for license details.
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: kong_import
+short_description: Restore Kong entities from a snapshot file
+description:
+  - Collections are applied in dependency order. Services, consumers and upstreams are applied first,
+    followed by routes and targets, and finally plugins. Existing entities are listed once per
+    collection and entities which already match the snapshot are skipped. The snapshot is read one
+    line at a time and the entities of each level are applied in parallel batches.
+options:
+  admin_url:
+    required: false
+    default: http://localhost:8001
+    description:
+      - Kong admin URL in the form (http|https)://host.domain[:port]
+  admin_username:
+    required: false
+    description:
+      - Username used when Basic authentication is required to access the Kong Admin API.
+  admin_password:
+    required: false
+    description:
+      - Password used when Basic authentication is required to access the Kong Admin API.
+  path:
+    required: true
+    description:
+      - A snapshot file written by the `kong_export` module, on the host executing the module.
+        Both gzip compressed and plain JSON lines files are accepted.
+  collections:
+    required: false
+    default: [services, routes, consumers, plugins, upstreams, targets]
+    description:
+      - The collections to import.
+  concurrency:
+    required: false
+    default: 8
+    description:
+      - The maximum number of Admin API requests made in parallel.
+  rate_limit:
+    required: false
+    default: 0
+    description:
+      - The maximum number of Admin API requests per second, or `0` for no limit. The rate is
+        halved whenever Kong responds slowly or with a server error and recovers gradually.
+  max_in_flight:
+    required: false
+    default: 0
+    description:
+      - The maximum number of Admin API requests awaiting a response, or `0` for no limit. The
+        limit is halved whenever Kong responds slowly or with a server error and recovers gradually.
+  latency_threshold:
+    required: false
+    default: 0
+    description:
+      - The Admin API response time in milliseconds above which requests are slowed down,
+        or `0` to only slow down on server errors.
+'''
+
+EXAMPLES = '''
+- name: Import Kong
+  kong_import:
+    path: /var/backups/kong.jsonl.gz
+    concurrency: 16
+  register: import
+
+- name: Debug import
+  debug: var=import
+'''
+
+RETURN = '''
+message:
+  description: The outcome of the import
+  returned: always
+  type: str
+  sample: OK
+response:
+  description: For every imported collection, the number of entities created, updated and unchanged along
+    with any failed requests
+  returned: always
+  type: dic
+'''
+
+from ansible.module_utils.kong import KongImportApi
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.urls import url_argument_spec
+
+def main():
+
+    module_spec = {
+        'admin_url': dict(required=False, default='http://localhost:8001', type='str'),
+        'url_username': dict(required=False, default=None, type='str', aliases=['admin_username']),
+        'url_password': dict(required=False, default=None, type='str', aliases=['admin_password'], no_log=True),
+        'path': dict(required=True, default=None, type='path'),
+        'collections': dict(required=False, default=['services', 'routes', 'consumers', 'plugins', 'upstreams', 'targets'], type='list'),
+        'concurrency': dict(required=False, default=8, type='int'),
+        'rate_limit': dict(required=False, default=0, type='float'),
+        'max_in_flight': dict(required=False, default=0, type='int'),
+        'latency_threshold': dict(required=False, default=0, type='int')
+    }
+
+    argument_spec = url_argument_spec()
+    argument_spec.update(module_spec)
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True
+    )
+
+    api = KongImportApi(module)
+
+    try:
+        result = api.restore()
+    except ValueError as error:
+        result = {
+            'message': str(error),
+            'failed': True
+        }
+
+    module.exit_json(**result)
+
+if __name__ == '__main__':
+    main()
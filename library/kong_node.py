@@ -35,6 +35,21 @@ options:
     description:
       - An action to perform. If `status` the response will contain usage information
         about a node. If `information` the response will contain generic details about a node.
+  fields:
+    required: false
+    description:
+      - A list of fields to return for each entity of a read action, dropping all others. Nested
+        fields are given in dot notation, such as `config.minute`.
+  summary_only:
+    required: false
+    default: false
+    description:
+      - If `true` a read action only returns the number of entities and their identifiers.
+  output_file:
+    required: false
+    description:
+      - A file on the host executing the module to which the response of a read action is written
+        instead of being returned.
 '''
 
 EXAMPLES = '''
@@ -87,14 +102,18 @@ def main():
         'admin_url': dict(required=False, default='http://localhost:8001', type='str'),
         'url_username': dict(required=False, default=None, type='str', aliases=['admin_username']),
         'url_password': dict(required=False, default=None, type='str', aliases=['admin_password'], no_log=True),
-        'action': dict(required=True, default=None, type='str', choices=['information', 'status'])
+        'action': dict(required=True, default=None, type='str', choices=['information', 'status']),
+        'fields': dict(required=False, default=None, type='list'),
+        'summary_only': dict(required=False, default=False, type='bool'),
+        'output_file': dict(required=False, default=None, type='path')
     }
 
     argument_spec = url_argument_spec()
     argument_spec.update(module_spec)
 
     module = AnsibleModule(
-        argument_spec=argument_spec
+        argument_spec=argument_spec,
+        supports_check_mode=True
     )
 
     api = KongNodeApi(module)
@@ -110,7 +129,7 @@ def main():
             'failed': True
         }
 
-    module.exit_json(**result)
+    module.exit_json(**api.output(result))
 
 if __name__ == '__main__':
     main()
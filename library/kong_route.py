@@ -43,7 +43,8 @@ options:
   id:
     required: false
     description:
-      - A unique name or UUID used as the route primary key.
+      - A unique name or UUID used as the route primary key. If omitted, the route is
+        looked up by its `service`, `hosts`, `paths` and `methods`.
   protocols:
     required: false
     default: ["http", "https"]
@@ -80,6 +81,72 @@ options:
     required: false
     description:
       - A foreign key linking it to a service entity.
+  ids:
+    required: false
+    description:
+      - A list of route identifiers. If given, the `create`, `find` or `delete` action is performed for
+        every route in a single invocation and the response contains the result of each.
+  entities:
+    required: false
+    description:
+      - A list of routes, each a dictionary of the options of this module. If given, the `create`, `find`
+        or `delete` action is performed for every route in a single invocation, using the options given
+        outside of the list as defaults, and the response contains the result of each.
+  concurrency:
+    required: false
+    default: 8
+    description:
+      - The maximum number of routes of the `ids` or `entities` options handled in parallel.
+  rate_limit:
+    required: false
+    default: 0
+    description:
+      - The maximum number of Admin API requests per second, or `0` for no limit. The rate is
+        halved whenever Kong responds slowly or with a server error and recovers gradually.
+  max_in_flight:
+    required: false
+    default: 0
+    description:
+      - The maximum number of Admin API requests awaiting a response, or `0` for no limit. The
+        limit is halved whenever Kong responds slowly or with a server error and recovers gradually.
+  latency_threshold:
+    required: false
+    default: 0
+    description:
+      - The Admin API response time in milliseconds above which requests are slowed down,
+        or `0` to only slow down on server errors.
+  prune:
+    required: false
+    default: false
+    description:
+      - If `true` and the `action` field is set to `create`, every route not given by the `ids` or
+        `entities` options is deleted. If `service` is given outside of the list only the routes of that
+        service are pruned. Plugins of a pruned route are deleted first. Any `filter` further limits the
+        routes pruned. In check mode the routes which would be deleted are reported.
+  max_deletions:
+    required: false
+    default: 100
+    description:
+      - The maximum number of entities pruning may delete, including dependent entities. Nothing is
+        deleted when more entities would be.
+  verify_nodes:
+    required: false
+    description:
+      - A list of Kong nodes to verify a `create` or `delete` action against, each either an admin URL or a
+        dictionary with an `admin_url` and an optional `proxy_url`. After a change every node is polled in
+        parallel until its Admin API returns the change and, given a `proxy_url`, until the `verify_probe`
+        request through its proxy succeeds. The time each node took is reported.
+  verify_timeout:
+    required: false
+    default: 60
+    description:
+      - The number of seconds to wait for every node in `verify_nodes` before failing.
+  verify_probe:
+    required: false
+    description:
+      - The request sent through the proxy of each node, a dictionary with a `path`, a `method`, any
+        `headers` and the expected `status`. Without a `status` the probe succeeds once the proxy stops
+        returning `404` after a `create` or starts returning `404` after a `delete`.
   size:
     required: false
     description:
@@ -89,6 +156,40 @@ options:
     required: false
     description:
       - A cursor used for pagination. `offset` is an object identifier that defines a place in the list.
+  state_path:
+    required: false
+    description:
+      - A directory on the host executing the module, typically the controller when delegated to
+        localhost, used to remember the last applied state of each entity. If the `action` field is
+        set to `create` and the entity has not changed since it was last applied, the Admin API is
+        not requested at all.
+  state_ttl:
+    required: false
+    default: 86400
+    description:
+      - The number of seconds after which a remembered entity is verified against the Admin API again,
+        catching changes made outside of Ansible.
+  filter:
+    required: false
+    description:
+      - A dictionary of field values which every listed route must match. Only applicable when the
+        `action` field is set to `list`, in which case every page of the collection is read. Kong
+        does not filter routes, so every field is filtered by the module.
+  fields:
+    required: false
+    description:
+      - A list of fields to return for each entity of a read action, dropping all others. Nested
+        fields are given in dot notation, such as `config.minute`.
+  summary_only:
+    required: false
+    default: false
+    description:
+      - If `true` a read action only returns the number of entities and their identifiers.
+  output_file:
+    required: false
+    description:
+      - A file on the host executing the module to which the response of a read action is written
+        instead of being returned.
 '''
 
 EXAMPLES = '''
@@ -112,6 +213,49 @@ EXAMPLES = '''
 - name: Debug route find
   debug: var=route_find
 
+- name: Create routes in a single batch
+  kong_route:
+    service: example-service
+    entities:
+      - { id: example-public-route, paths: /public }
+      - { id: example-private-route, paths: /private }
+    action: create
+  register: route_batch
+
+- name: Debug route batch
+  debug: var=route_batch
+
+- name: Create routes and delete all other routes of the service
+  kong_route:
+    service: example-service
+    entities:
+      - { id: example-public-route, paths: /public }
+      - { id: example-private-route, paths: /private }
+    prune: true
+    max_deletions: 10
+    action: create
+  register: route_prune
+
+- name: Debug route prune
+  debug: var=route_prune
+
+- name: Create a route and wait for every node to serve it
+  kong_route:
+    id: example-route
+    service: example-service
+    hosts: example.com
+    verify_nodes:
+      - { admin_url: 'http://kong-1:8001', proxy_url: 'http://kong-1:8000' }
+      - { admin_url: 'http://kong-2:8001', proxy_url: 'http://kong-2:8000' }
+    verify_probe:
+      path: /
+      headers: { Host: example.com }
+    action: create
+  register: route_verify
+
+- name: Debug route verify
+  debug: var=route_verify
+
 - name: List all route plugins
   kong_route:
     id: example-route
@@ -181,30 +325,48 @@ def main():
         'strip_path': dict(required=False, default=None, type='bool', include=True),
         'preserve_host': dict(required=False, default=None, type='bool', include=True),
         'service': dict(required=False, default=None, type='str', include=True, foreign='id', uuid=True),
+        'ids': dict(required=False, default=None, type='list'),
+        'entities': dict(required=False, default=None, type='list'),
+        'concurrency': dict(required=False, default=8, type='int'),
+        'rate_limit': dict(required=False, default=0, type='float'),
+        'max_in_flight': dict(required=False, default=0, type='int'),
+        'latency_threshold': dict(required=False, default=0, type='int'),
+        'prune': dict(required=False, default=False, type='bool'),
+        'max_deletions': dict(required=False, default=100, type='int'),
+        'verify_nodes': dict(required=False, default=None, type='list'),
+        'verify_timeout': dict(required=False, default=60, type='int'),
+        'verify_probe': dict(required=False, default=None, type='dict'),
         'size': dict(required=False, default=None, type='int', include=True),
         'offset': dict(required=False, default=None, type='int', include=True),
         'created_at': dict(required=False, default=None, type='int', include=False),
-        'updated_at': dict(required=False, default=None, type='int', include=False)
+        'updated_at': dict(required=False, default=None, type='int', include=False),
+        'filter': dict(required=False, default=None, type='dict'),
+        'fields': dict(required=False, default=None, type='list'),
+        'summary_only': dict(required=False, default=False, type='bool'),
+        'output_file': dict(required=False, default=None, type='path'),
+        'state_path': dict(required=False, default=None, type='path'),
+        'state_ttl': dict(required=False, default=86400, type='int')
     }
 
     argument_spec = url_argument_spec()
     argument_spec.update(module_spec)
 
     module = AnsibleModule(
-        argument_spec=argument_spec
+        argument_spec=argument_spec,
+        supports_check_mode=True
     )
 
     api = KongRouteApi(module)
 
     try:
         if api.action == 'create':
-            result = api.required('id, service').either('methods, hosts, paths').create()
+            result = api.batch(lambda api: api.identify().required('id, service').either('methods, hosts, paths').create())
         elif api.action == 'delete':
-            result = api.required('id').delete()
+            result = api.batch(lambda api: api.identify().required('id').delete())
         elif api.action == 'find':
-            result = api.required('id').find()
+            result = api.batch(lambda api: api.identify().required('id').find())
         elif api.action == 'plugins':
-            result = api.required('id').plugins()
+            result = api.identify().required('id').plugins()
         elif api.action == 'list':
             result = api.list()
     except ValueError, error:
@@ -213,7 +375,7 @@ def main():
             'failed': True
         }
 
-    module.exit_json(**result)
+    module.exit_json(**api.output(result))
 
 if __name__ == '__main__':
     main()
@@ -36,12 +36,15 @@ options:
       - routes
       - plugins
       - list
+      - cutover
     description:
       - An action to perform. If `create` a service will be created or updated. If `delete` a
         service will be removed. If `find` the response will contain service information. If `list`
         the response will contain a collection of services and all their information. If `routes` the
         response will contain a collection of routes and all their information. If `plugins` the
-        response will contain a collection of plugins and all their information.
+        response will contain a collection of plugins and all their information. If `cutover` every
+        route of the service will be repointed to the `destination` service concurrently, after which
+        the routes of both services are verified. Swap the `id` and `destination` fields to roll back.
   id:
     required: false
     description:
@@ -97,6 +100,77 @@ options:
       - A convenience field applicable when the `action` field is set to `create`.
         If this field is defined, its value will be split and used to set the
         `protocol`, `host`, `port` and `path` fields.
+  destination:
+    required: false
+    description:
+      - A unique name or UUID of the service receiving the routes. Only applicable when the
+        `action` field is set to `cutover`.
+  concurrency:
+    required: false
+    default: 16
+    description:
+      - The maximum number of routes repointed in parallel when the `action` field is set to `cutover`,
+        or of services of the `ids` or `entities` options handled in parallel.
+  rate_limit:
+    required: false
+    default: 0
+    description:
+      - The maximum number of Admin API requests per second, or `0` for no limit. The rate is
+        halved whenever Kong responds slowly or with a server error and recovers gradually.
+  max_in_flight:
+    required: false
+    default: 0
+    description:
+      - The maximum number of Admin API requests awaiting a response, or `0` for no limit. The
+        limit is halved whenever Kong responds slowly or with a server error and recovers gradually.
+  latency_threshold:
+    required: false
+    default: 0
+    description:
+      - The Admin API response time in milliseconds above which requests are slowed down,
+        or `0` to only slow down on server errors.
+  ids:
+    required: false
+    description:
+      - A list of service identifiers. If given, the `create`, `find` or `delete` action is performed for
+        every service in a single invocation and the response contains the result of each.
+  entities:
+    required: false
+    description:
+      - A list of services, each a dictionary of the options of this module. If given, the `create`, `find`
+        or `delete` action is performed for every service in a single invocation, using the options given
+        outside of the list as defaults, and the response contains the result of each.
+  prune:
+    required: false
+    default: false
+    description:
+      - If `true` and the `action` field is set to `create`, every service not given by the `ids` or
+        `entities` options is deleted. Routes and plugins of a pruned service are deleted first. In check
+        mode the services which would be deleted are reported.
+  max_deletions:
+    required: false
+    default: 100
+    description:
+      - The maximum number of entities pruning may delete, including dependent entities. Nothing is
+        deleted when more entities would be.
+  verify_nodes:
+    required: false
+    description:
+      - A list of Kong nodes to verify a `create` or `delete` action against, each either an admin URL or a
+        dictionary with an `admin_url` and an optional `proxy_url`. After a change every node is polled in
+        parallel until its Admin API returns the change and, given a `proxy_url`, until the `verify_probe`
+        request through its proxy succeeds. The time each node took is reported.
+  verify_timeout:
+    required: false
+    default: 60
+    description:
+      - The number of seconds to wait for every node in `verify_nodes` before failing.
+  verify_probe:
+    required: false
+    description:
+      - The request sent through the proxy of each node, a dictionary with a `path`, a `method`, any
+        `headers` and the expected `status`. Without a `status` the probe succeeds once the proxy stops
+        returning `404` after a `create` or starts returning `404` after a `delete`.
   size:
     required: false
     description:
@@ -107,6 +181,34 @@ options:
     description:
       - A cursor used for pagination. The `offset` field is an object identifier that
         defines a place in the list. Only applicable when the `action` field is set to `list`.
+  state_path:
+    required: false
+    description:
+      - A directory on the host executing the module, typically the controller when delegated to
+        localhost, used to remember the last applied state of each entity. If the `action` field is
+        set to `create` and the entity has not changed since it was last applied, the Admin API is
+        not requested at all.
+  state_ttl:
+    required: false
+    default: 86400
+    description:
+      - The number of seconds after which a remembered entity is verified against the Admin API again,
+        catching changes made outside of Ansible.
+  fields:
+    required: false
+    description:
+      - A list of fields to return for each entity of a read action, dropping all others. Nested
+        fields are given in dot notation, such as `config.minute`.
+  summary_only:
+    required: false
+    default: false
+    description:
+      - If `true` a read action only returns the number of entities and their identifiers.
+  output_file:
+    required: false
+    description:
+      - A file on the host executing the module to which the response of a read action is written
+        instead of being returned.
 '''
 
 EXAMPLES = '''
@@ -130,6 +232,17 @@ EXAMPLES = '''
 - name: Debug service find
   debug: var=service_find
 
+- name: Create services in a single batch
+  kong_service:
+    entities:
+      - { id: example-service, name: example-service, url: http://mockbin.org/request }
+      - { id: other-service, name: other-service, url: http://mockbin.org/bin }
+    action: create
+  register: service_batch
+
+- name: Debug service batch
+  debug: var=service_batch
+
 - name: List all service routes
   kong_service:
     id: example-service
@@ -156,6 +269,16 @@ EXAMPLES = '''
 - name: Debug service list
   debug: var=service_list
 
+- name: Cut traffic over to a new service version
+  kong_service:
+    id: example-service
+    destination: example-service-v2
+    action: cutover
+  register: service_cutover
+
+- name: Debug service cutover
+  debug: var=service_cutover
+
 - name: Delete a service
   kong_service:
     id: example-service
@@ -198,7 +321,7 @@ def main():
         'admin_url': dict(required=False, default='http://localhost:8001', type='str'),
         'url_username': dict(required=False, default=None, type='str', aliases=['admin_username']),
         'url_password': dict(required=False, default=None, type='str', aliases=['admin_password'], no_log=True),
-        'action': dict(required=True, default=None, type='str', choices=['create', 'delete', 'find', 'routes', 'plugins', 'list']),
+        'action': dict(required=True, default=None, type='str', choices=['create', 'delete', 'find', 'routes', 'plugins', 'list', 'cutover']),
         'id': dict(required=False, default=None, type='str', include=True, uuid=True),
         'name': dict(required=False, default=None, type='str', include=True),
         'retries': dict(required=False, default=None, type='int', include=True),
@@ -210,41 +333,61 @@ def main():
         'port': dict(required=False, default=None, type='str', include=True),
         'path': dict(required=False, default=None, type='str', include=True),
         'url': dict(required=False, default=None, type='str', include=True),
+        'destination': dict(required=False, default=None, type='str'),
+        'concurrency': dict(required=False, default=16, type='int'),
+        'rate_limit': dict(required=False, default=0, type='float'),
+        'max_in_flight': dict(required=False, default=0, type='int'),
+        'latency_threshold': dict(required=False, default=0, type='int'),
+        'ids': dict(required=False, default=None, type='list'),
+        'entities': dict(required=False, default=None, type='list'),
+        'prune': dict(required=False, default=False, type='bool'),
+        'max_deletions': dict(required=False, default=100, type='int'),
+        'verify_nodes': dict(required=False, default=None, type='list'),
+        'verify_timeout': dict(required=False, default=60, type='int'),
+        'verify_probe': dict(required=False, default=None, type='dict'),
         'size': dict(required=False, default=None, type='int', include=True),
         'offset': dict(required=False, default=None, type='int', include=True),
         'created_at': dict(required=False, default=None, type='int', include=False),
-        'updated_at': dict(required=False, default=None, type='int', include=False)
+        'updated_at': dict(required=False, default=None, type='int', include=False),
+        'fields': dict(required=False, default=None, type='list'),
+        'summary_only': dict(required=False, default=False, type='bool'),
+        'output_file': dict(required=False, default=None, type='path'),
+        'state_path': dict(required=False, default=None, type='path'),
+        'state_ttl': dict(required=False, default=86400, type='int')
     }
 
     argument_spec = url_argument_spec()
     argument_spec.update(module_spec)
 
     module = AnsibleModule(
-        argument_spec=argument_spec
+        argument_spec=argument_spec,
+        supports_check_mode=True
     )
 
     api = KongServiceApi(module)
 
     try:
         if api.action == 'create':
-            result = api.required('id').create()
+            result = api.batch(lambda api: api.required('id').create())
         elif api.action == 'delete':
-            result = api.required('id').delete()
+            result = api.batch(lambda api: api.required('id').delete())
         elif api.action == 'find':
-            result = api.required('id').find()
+            result = api.batch(lambda api: api.required('id').find())
         elif api.action == 'routes':
             result = api.required('id').routes()
         elif api.action == 'plugins':
             result = api.required('id').plugins()
         elif api.action == 'list':
             result = api.list()
+        elif api.action == 'cutover':
+            result = api.required('id').cutover()
     except ValueError, error:
         result = {
             'message': str(error),
             'failed': True
         }
 
-    module.exit_json(**result)
+    module.exit_json(**api.output(result))
 
 if __name__ == '__main__':
     main()
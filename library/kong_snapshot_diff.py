@@ -0,0 +1,88 @@
+#!/usr/bin/python
+
+# Copyright (c) Ontic. (http://www.ontic.com.au). All rights reserved.
+# See the COPYING file bundled with this package for license details.
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: kong_snapshot_diff
+short_description: Compare two Kong snapshot files
+description:
+  - Both snapshots are read one line at a time and merged by collection and key, so neither is
+    loaded into memory and the Admin API is never requested. Run the module with
+    `delegate_to: localhost` to compare snapshots on the controller.
+options:
+  source:
+    required: true
+    description:
+      - A snapshot file written by the `kong_export` module, such as an export of production.
+  destination:
+    required: true
+    description:
+      - A snapshot file written by the `kong_export` module, such as an export of staging.
+'''
+
+EXAMPLES = '''
+- name: Compare production with staging
+  kong_snapshot_diff:
+    source: /var/backups/kong-production.jsonl.gz
+    destination: /var/backups/kong-staging.jsonl.gz
+  delegate_to: localhost
+  register: snapshot_diff
+
+- name: Debug snapshot diff
+  debug: var=snapshot_diff
+'''
+
+RETURN = '''
+message:
+  description: Whether the snapshots differ
+  returned: always
+  type: str
+  sample: OK
+different:
+  description: True if the snapshots differ
+  returned: always
+  type: bool
+response:
+  description: The `changes` required to turn the source into the destination, each entity being `added`,
+    `removed` or `modified` along with its differing fields, and the `counts` of changes per collection
+  returned: always
+  type: dic
+'''
+
+from ansible.module_utils.kong import KongSnapshotDiffApi
+from ansible.module_utils.basic import AnsibleModule
+
+def main():
+
+    module_spec = {
+        'source': dict(required=True, default=None, type='path'),
+        'destination': dict(required=True, default=None, type='path')
+    }
+
+    module = AnsibleModule(
+        argument_spec=module_spec,
+        supports_check_mode=True
+    )
+
+    api = KongSnapshotDiffApi(module)
+
+    try:
+        result = api.compare()
+    except (IOError, ValueError) as error:
+        result = {
+            'message': str(error),
+            'failed': True
+        }
+
+    module.exit_json(**result)
+
+if __name__ == '__main__':
+    main()
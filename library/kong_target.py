@@ -35,13 +35,15 @@ options:
       - find
       - healthy
       - unhealthy
+      - drain
       - list
     description:
       - An action to perform. If `create` a target will be created or updated. If `delete` a
         target will be removed. If `find` the response will contain target information. If `healthy`
         the target health status in the load balancer is considered enabled. If `unhealthy` the target
-        health status in the load balancer is considered disabled. If `list` the response will contain
-        a collection of targets and all their information.
+        health status in the load balancer is considered disabled. If `drain` the target is taken out of
+        the load balancer and the action waits until its traffic has settled. If `list` the response will
+        contain a collection of targets and all their information.
   target:
     required: false
     description:
@@ -54,6 +56,28 @@ options:
     required: false
     description:
       - A foreign key linking it to an upstream entity.
+  drain_by:
+    required: false
+    default: weight
+    choices:
+      - weight
+      - unhealthy
+    description:
+      - How the target is taken out of the load balancer when the `action` field is set to `drain`.
+        If `weight` the target weight is set to `0`, if `unhealthy` the target is marked as unhealthy.
+  drain_timeout:
+    required: false
+    default: 300
+    description:
+      - The number of seconds to wait for the target to drain before failing. The upstream health and
+        the node connection counters are polled with an exponential backoff.
+  drain_connections:
+    required: false
+    default: 1
+    description:
+      - The number of requests the node may still be writing for the target to be considered drained.
+        Kong only counts connections for the node as a whole, which includes the request polling
+        the counters.
   size:
     required: false
     description:
@@ -64,6 +88,34 @@ options:
     description:
       - A cursor used for pagination. The `offset` field is an object identifier that
         defines a place in the list. Only applicable when the `action` field is set to `list`.
+  state_path:
+    required: false
+    description:
+      - A directory on the host executing the module, typically the controller when delegated to
+        localhost, used to remember the last applied state of each entity. If the `action` field is
+        set to `create` and the entity has not changed since it was last applied, the Admin API is
+        not requested at all.
+  state_ttl:
+    required: false
+    default: 86400
+    description:
+      - The number of seconds after which a remembered entity is verified against the Admin API again,
+        catching changes made outside of Ansible.
+  fields:
+    required: false
+    description:
+      - A list of fields to return for each entity of a read action, dropping all others. Nested
+        fields are given in dot notation, such as `config.minute`.
+  summary_only:
+    required: false
+    default: false
+    description:
+      - If `true` a read action only returns the number of entities and their identifiers.
+  output_file:
+    required: false
+    description:
+      - A file on the host executing the module to which the response of a read action is written
+        instead of being returned.
 '''
 
 EXAMPLES = '''
@@ -108,6 +160,17 @@ EXAMPLES = '''
 - name: Debug target healthy
   debug: var=target_healthy
 
+- name: Drain target
+  kong_target:
+    target: 127.0.0.1:9080
+    upstream: example-upstream
+    drain_timeout: 120
+    action: drain
+  register: target_drain
+
+- name: Debug target drain
+  debug: var=target_drain
+
 - name: List all targets
   kong_target:
     action: list
@@ -158,21 +221,30 @@ def main():
         'admin_url': dict(required=False, default='http://localhost:8001', type='str'),
         'url_username': dict(required=False, default=None, type='str', aliases=['admin_username']),
         'url_password': dict(required=False, default=None, type='str', aliases=['admin_password'], no_log=True),
-        'action': dict(required=True, default=None, type='str', choices=['create', 'delete', 'find', 'healthy', 'unhealthy', 'list']),
+        'action': dict(required=True, default=None, type='str', choices=['create', 'delete', 'find', 'healthy', 'unhealthy', 'drain', 'list']),
         'upstream_id': dict(required=False, default=None, type='str', include=True, uuid=True, aliases=['upstream']),
         'target': dict(required=False, default=None, type='str', include=True),
         'weight': dict(required=False, default=None, type='int', include=True),
+        'drain_by': dict(required=False, default='weight', type='str', choices=['weight', 'unhealthy']),
+        'drain_timeout': dict(required=False, default=300, type='int'),
+        'drain_connections': dict(required=False, default=1, type='int'),
         'size': dict(required=False, default=None, type='int', include=True),
         'offset': dict(required=False, default=None, type='int', include=True),
         'created_at': dict(required=False, default=None, type='int', include=False),
-        'updated_at': dict(required=False, default=None, type='int', include=False)
+        'updated_at': dict(required=False, default=None, type='int', include=False),
+        'fields': dict(required=False, default=None, type='list'),
+        'summary_only': dict(required=False, default=False, type='bool'),
+        'output_file': dict(required=False, default=None, type='path'),
+        'state_path': dict(required=False, default=None, type='path'),
+        'state_ttl': dict(required=False, default=86400, type='int')
     }
 
     argument_spec = url_argument_spec()
     argument_spec.update(module_spec)
 
     module = AnsibleModule(
-        argument_spec=argument_spec
+        argument_spec=argument_spec,
+        supports_check_mode=True
     )
 
     api = KongTargetApi(module)
@@ -188,6 +260,8 @@ def main():
             result = api.required('upstream_id, target').healthy()
         elif api.action == 'unhealthy':
             result = api.required('upstream_id, target').unhealthy()
+        elif api.action == 'drain':
+            result = api.required('upstream_id, target').drain()
         elif api.action == 'list':
             result = api.required('upstream_id').list()
     except ValueError, error:
@@ -196,7 +270,7 @@ def main():
             'failed': True
         }
 
-    module.exit_json(**result)
+    module.exit_json(**api.output(result))
 
 if __name__ == '__main__':
     main()
@@ -35,11 +35,14 @@ options:
       - find
       - health
       - list
+      - shift
     description:
       - An action to perform. If `create` an upstream will be created or updated. If `delete` an
         upstream will be removed. If `find` the response will contain upstream information. If `list`
         the response will contain a collection of upstreams and all their information. If `health` the
-        response will contain information relating to the health of each target.
+        response will contain information relating to the health of each target. If `shift` the weight
+        of the upstream will be moved from the `source_targets` to the `destination_targets` in `steps`,
+        rolling back to the original weights as soon as a step breaches a threshold.
   id:
     required: false
     description:
@@ -80,6 +83,121 @@ options:
     required: false
     description:
       - The healthcheck properties for the upstream.
+  source_targets:
+    required: false
+    description:
+      - A list of targets, in the form host:port, the weight is moved away from. Only applicable when the
+        `action` field is set to `shift`.
+  destination_targets:
+    required: false
+    description:
+      - A list of targets, in the form host:port, the weight is moved to. Only applicable when the
+        `action` field is set to `shift`.
+  steps:
+    required: false
+    default: [10, 25, 50, 100]
+    description:
+      - The percentages of the `total_weight` given to the destination targets at each step.
+  total_weight:
+    required: false
+    default: 1000
+    description:
+      - The weight shared between the source and destination targets at every step.
+  interval:
+    required: false
+    default: 60
+    description:
+      - The number of seconds each step is observed for. Target health is polled with an exponential
+        backoff until the destination targets are healthy or the interval has passed.
+  max_unhealthy:
+    required: false
+    default: 0
+    description:
+      - The number of destination targets which may be unhealthy at the end of a step.
+  max_error_rate:
+    required: false
+    description:
+      - The highest ratio of 5xx responses to all responses during a step. Requires `metrics_path`.
+  max_latency:
+    required: false
+    description:
+      - The highest average upstream latency in milliseconds during a step. Requires `metrics_path`.
+  metrics_path:
+    required: false
+    description:
+      - The Admin API path of the Prometheus plugin metrics, usually `/metrics`. Kong's `/status`
+        does not expose error or latency counters, so the error rate and latency thresholds are
+        only evaluated when this is set.
+  metrics_service:
+    required: false
+    description:
+      - Only count the metrics of the service with this name, rather than those of the whole node.
+  concurrency:
+    required: false
+    default: 4
+    description:
+      - The maximum number of target weights changed in parallel when the `action` field is set to
+        `shift`, or of upstreams of the `ids` or `entities` options handled in parallel.
+  rate_limit:
+    required: false
+    default: 0
+    description:
+      - The maximum number of Admin API requests per second, or `0` for no limit. The rate is
+        halved whenever Kong responds slowly or with a server error and recovers gradually.
+  max_in_flight:
+    required: false
+    default: 0
+    description:
+      - The maximum number of Admin API requests awaiting a response, or `0` for no limit. The
+        limit is halved whenever Kong responds slowly or with a server error and recovers gradually.
+  latency_threshold:
+    required: false
+    default: 0
+    description:
+      - The Admin API response time in milliseconds above which requests are slowed down,
+        or `0` to only slow down on server errors.
+  ids:
+    required: false
+    description:
+      - A list of upstream identifiers. If given, the `create`, `find` or `delete` action is performed for
+        every upstream in a single invocation and the response contains the result of each.
+  entities:
+    required: false
+    description:
+      - A list of upstreams, each a dictionary of the options of this module. If given, the `create`, `find`
+        or `delete` action is performed for every upstream in a single invocation, using the options given
+        outside of the list as defaults, and the response contains the result of each.
+  prune:
+    required: false
+    default: false
+    description:
+      - If `true` and the `action` field is set to `create`, every upstream not given by the `ids` or
+        `entities` options is deleted. Any `filter` further limits the upstreams pruned. In check mode the
+        upstreams which would be deleted are reported.
+  max_deletions:
+    required: false
+    default: 100
+    description:
+      - The maximum number of entities pruning may delete, including dependent entities. Nothing is
+        deleted when more entities would be.
+  verify_nodes:
+    required: false
+    description:
+      - A list of Kong nodes to verify a `create` or `delete` action against, each either an admin URL or a
+        dictionary with an `admin_url` and an optional `proxy_url`. After a change every node is polled in
+        parallel until its Admin API returns the change and, given a `proxy_url`, until the `verify_probe`
+        request through its proxy succeeds. The time each node took is reported.
+  verify_timeout:
+    required: false
+    default: 60
+    description:
+      - The number of seconds to wait for every node in `verify_nodes` before failing.
+  verify_probe:
+    required: false
+    description:
+      - The request sent through the proxy of each node, a dictionary with a `path`, a `method`, any
+        `headers` and the expected `status`. Without a `status` the probe succeeds once the proxy stops
+        returning `404` after a `create` or starts returning `404` after a `delete`.
   size:
     required: false
     description:
@@ -90,6 +208,41 @@ options:
     description:
       - A cursor used for pagination. The `offset` field is an object identifier that
         defines a place in the list. Only applicable when the `action` field is set to `list`.
+  state_path:
+    required: false
+    description:
+      - A directory on the host executing the module, typically the controller when delegated to
+        localhost, used to remember the last applied state of each entity. If the `action` field is
+        set to `create` and the entity has not changed since it was last applied, the Admin API is
+        not requested at all.
+  state_ttl:
+    required: false
+    default: 86400
+    description:
+      - The number of seconds after which a remembered entity is verified against the Admin API again,
+        catching changes made outside of Ansible.
+  filter:
+    required: false
+    description:
+      - A dictionary of field values which every listed upstream must match. Only applicable when the
+        `action` field is set to `list`, in which case every page of the collection is read. The
+        `id`, `name` and `slots` fields are filtered by Kong, any other fields are filtered by the
+        module.
+  fields:
+    required: false
+    description:
+      - A list of fields to return for each entity of a read action, dropping all others. Nested
+        fields are given in dot notation, such as `config.minute`.
+  summary_only:
+    required: false
+    default: false
+    description:
+      - If `true` a read action only returns the number of entities and their identifiers.
+  output_file:
+    required: false
+    description:
+      - A file on the host executing the module to which the response of a read action is written
+        instead of being returned.
 '''
 
 EXAMPLES = '''
@@ -121,6 +274,17 @@ EXAMPLES = '''
 - name: Debug upstream health
   debug: var=upstream_health
 
+- name: Delete upstreams in a single batch
+  kong_upstream:
+    ids:
+      - example-upstream
+      - other-upstream
+    action: delete
+  register: upstream_batch
+
+- name: Debug upstream batch
+  debug: var=upstream_batch
+
 - name: List all upstreams
   kong_upstream:
     action: list
@@ -129,6 +293,23 @@ EXAMPLES = '''
 - name: Debug upstream list
   debug: var=upstream_list
 
+- name: Shift traffic to a canary target
+  kong_upstream:
+    id: example-upstream
+    source_targets:
+      - 127.0.0.1:9080
+    destination_targets:
+      - 127.0.0.1:9090
+    steps: [5, 25, 50, 100]
+    interval: 120
+    max_error_rate: 0.01
+    metrics_path: /metrics
+    action: shift
+  register: upstream_shift
+
+- name: Debug upstream shift
+  debug: var=upstream_shift
+
 - name: Delete a upstream
   kong_upstream:
     id: example-upstream
@@ -171,7 +352,7 @@ def main():
         'admin_url': dict(required=False, default='http://localhost:8001', type='str'),
         'url_username': dict(required=False, default=None, type='str', aliases=['admin_username']),
         'url_password': dict(required=False, default=None, type='str', aliases=['admin_password'], no_log=True),
-        'action': dict(required=True, default=None, type='str', choices=['create', 'delete', 'find', 'health', 'list']),
+        'action': dict(required=True, default=None, type='str', choices=['create', 'delete', 'find', 'health', 'list', 'shift']),
         'id': dict(required=False, default=None, type='str', include=True, uuid=True),
         'name': dict(required=False, default=None, type='str', include=True),
         'slots': dict(required=False, default=None, type='int', include=True),
@@ -182,39 +363,69 @@ def main():
         'hash_on_cookie': dict(required=False, default=None, type='str', include=True),
         'hash_on_cookie_path': dict(required=False, default=None, type='str', include=True),
         'healthchecks': dict(required=False, default=None, type='dict', include=True),
+        'source_targets': dict(required=False, default=None, type='list'),
+        'destination_targets': dict(required=False, default=None, type='list'),
+        'steps': dict(required=False, default=[10, 25, 50, 100], type='list'),
+        'total_weight': dict(required=False, default=1000, type='int'),
+        'interval': dict(required=False, default=60, type='int'),
+        'max_unhealthy': dict(required=False, default=0, type='int'),
+        'max_error_rate': dict(required=False, default=None, type='float'),
+        'max_latency': dict(required=False, default=None, type='float'),
+        'metrics_path': dict(required=False, default=None, type='str'),
+        'metrics_service': dict(required=False, default=None, type='str'),
+        'concurrency': dict(required=False, default=4, type='int'),
+        'rate_limit': dict(required=False, default=0, type='float'),
+        'max_in_flight': dict(required=False, default=0, type='int'),
+        'latency_threshold': dict(required=False, default=0, type='int'),
+        'ids': dict(required=False, default=None, type='list'),
+        'entities': dict(required=False, default=None, type='list'),
+        'prune': dict(required=False, default=False, type='bool'),
+        'max_deletions': dict(required=False, default=100, type='int'),
+        'verify_nodes': dict(required=False, default=None, type='list'),
+        'verify_timeout': dict(required=False, default=60, type='int'),
+        'verify_probe': dict(required=False, default=None, type='dict'),
         'size': dict(required=False, default=None, type='int', include=True),
         'offset': dict(required=False, default=None, type='int', include=True),
         'created_at': dict(required=False, default=None, type='int', include=False),
-        'updated_at': dict(required=False, default=None, type='int', include=False)
+        'updated_at': dict(required=False, default=None, type='int', include=False),
+        'filter': dict(required=False, default=None, type='dict'),
+        'fields': dict(required=False, default=None, type='list'),
+        'summary_only': dict(required=False, default=False, type='bool'),
+        'output_file': dict(required=False, default=None, type='path'),
+        'state_path': dict(required=False, default=None, type='path'),
+        'state_ttl': dict(required=False, default=86400, type='int')
     }
 
     argument_spec = url_argument_spec()
     argument_spec.update(module_spec)
 
     module = AnsibleModule(
-        argument_spec=argument_spec
+        argument_spec=argument_spec,
+        supports_check_mode=True
     )
 
     api = KongUpstreamApi(module)
 
     try:
         if api.action == 'create':
-            result = api.required('id').create()
+            result = api.batch(lambda api: api.required('id').create())
         elif api.action == 'delete':
-            result = api.required('id').delete()
+            result = api.batch(lambda api: api.required('id').delete())
         elif api.action == 'find':
-            result = api.required('id').find()
+            result = api.batch(lambda api: api.required('id').find())
         elif api.action == 'health':
             result = api.required('id').health()
         elif api.action == 'list':
             result = api.list()
+        elif api.action == 'shift':
+            result = api.required('id').shift()
     except ValueError, error:
         result = {
             'message': str(error),
             'failed': True
         }
 
-    module.exit_json(**result)
+    module.exit_json(**api.output(result))
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,281 @@
+# Copyright (c) Ontic. (http://www.ontic.com.au). All rights reserved.
+# See the COPYING file bundled with this package for license details.
+
+DOCUMENTATION = '''
+---
+lookup: kong
+short_description: Read Kong entities from the controller
+description:
+  - Performs a GET request against the Kong Admin API for every term without starting a module
+    on the remote host. Collections are read page by page and returned as a single list.
+  - Results are memoized per admin URL and path for the duration of the playbook run, so repeated
+    lookups of the same path only cost one HTTP request. As every task is templated in its own
+    worker process, results are shared through a directory only readable by the current user,
+    named after the PID of the playbook process. The directories of finished runs are removed
+    the next time the lookup is used.
+options:
+  _terms:
+    required: true
+    description:
+      - Admin API paths such as `services`, `routes?service=example-service` or
+        `upstreams/example-upstream/health`. An identifier following a collection name is
+        converted to a UUID the same way the `id` option of the kong modules is. Query
+        parameters are applied as filters on the returned entities.
+  admin_url:
+    required: false
+    default: http://localhost:8001
+    description:
+      - Kong admin URL in the form (http|https)://host.domain[:port]
+  admin_username:
+    required: false
+    description:
+      - Username used when Basic authentication is required to access the Kong Admin API.
+  admin_password:
+    required: false
+    description:
+      - Password used when Basic authentication is required to access the Kong Admin API.
+  validate_certs:
+    required: false
+    default: true
+    description:
+      - If `false` SSL certificates of the Kong Admin API will not be validated.
+  cache:
+    required: false
+    default: true
+    description:
+      - If `false` the Admin API is always requested and the result is not memoized.
+  cache_ttl:
+    required: false
+    default: 300
+    description:
+      - The number of seconds a memoized result remains valid.
+'''
+
+EXAMPLES = '''
+- name: Debug all services
+  debug: msg="{{ lookup('kong', 'services') }}"
+
+- name: Debug the routes of a service
+  debug: msg="{{ query('kong', 'routes?service=example-service', admin_url='http://localhost:8001') }}"
+
+- name: Only run when the upstream has targets
+  debug: msg="The upstream has targets"
+  when: lookup('kong', 'upstreams/example-upstream/health', cache=false) | length > 0
+'''
+
+RETURN = '''
+_raw:
+  description: A list of entities for collections, otherwise the response of the request
+  type: list
+'''
+
+import errno, hashlib, json, multiprocessing, os, shutil, socket, tempfile, time
+from ansible.errors import AnsibleError
+from ansible.plugins.lookup import LookupBase
+from ansible.module_utils.urls import open_url
+from ansible.module_utils.six.moves.urllib.error import HTTPError, URLError
+from ansible.module_utils.six.moves.urllib.parse import urlsplit, parse_qsl
+
+def load_module_utils():
+
+    # The role's module_utils are only shipped with modules, so they are
+    # loaded directly from the file when running on the controller.
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'module_utils', 'kong.py')
+
+    try:
+        from importlib.util import spec_from_file_location, module_from_spec
+    except ImportError:
+        import imp
+        return imp.load_source('ansible_role_kong_module_utils', path)
+
+    spec = spec_from_file_location('ansible_role_kong_module_utils', path)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+kong = load_module_utils()
+
+class KongLookupModule(object):
+
+    # Provides the parts of an AnsibleModule used by KongApi.
+    def __init__(self, params):
+
+        self.params = params
+        self.argument_spec = {}
+
+class KongLookupApi(kong.KongApi):
+
+    collections = ['services', 'routes', 'consumers', 'plugins', 'upstreams']
+    reserved = ['enabled', 'schema']
+    paginated = ['services', 'routes', 'consumers', 'plugins', 'upstreams', 'targets', 'all']
+
+    def fetch(self, url, data, headers, method):
+
+        params = self.module.params
+        info = {'url': url, 'status': -1, 'msg': ''}
+
+        try:
+            output = open_url(url, data=data, headers=headers, method=method,
+                              url_username=params['url_username'], url_password=params['url_password'],
+                              force_basic_auth=params['url_username'] is not None,
+                              validate_certs=params['validate_certs'])
+            info['status'] = output.getcode()
+            info['msg'] = 'OK'
+        except HTTPError as error:
+            output = None
+            info['status'] = error.code
+            info['msg'] = str(error)
+            info['body'] = error.read()
+        except (URLError, socket.error) as error:
+            output = None
+            info['msg'] = str(error)
+
+        return output, info
+
+    def read(self, term):
+
+        split = urlsplit(term)
+        segments = [segment for segment in split.path.split('/') if segment]
+        filters = dict(parse_qsl(split.query))
+
+        for index in range(1, len(segments)):
+            if segments[index - 1] in self.collections and segments[index] not in self.reserved:
+                segments[index] = self.uuid(segments[index])
+
+        path = '/' + '/'.join(segments)
+
+        if segments and segments[-1] in self.paginated:
+            return [data for data in self.paginate(path) if self.match(data, filters)]
+
+        result = self.request(path, 'GET')
+
+        if result['status'] >= 400:
+            raise ValueError('Unable to read "' + result['url'] + '": ' + str(result['message']))
+
+        if isinstance(result['response'].get('data', None), list):
+            return [data for data in result['response']['data'] if self.match(data, filters)]
+
+        return result['response']
+
+class LookupModule(LookupBase):
+
+    memo = {}
+    prefix = 'ansible-kong-lookup-'
+
+    def cache_directory(self):
+
+        # Every task is templated in a worker process forked from the
+        # playbook process, which makes its PID identify the current run.
+        # Lookups templated in the playbook process itself use its own PID.
+        if multiprocessing.current_process().name == 'MainProcess':
+            pid = os.getpid()
+        else:
+            pid = os.getppid()
+
+        directory = os.path.join(tempfile.gettempdir(), self.prefix + str(os.getuid()) + '-' + str(pid))
+
+        if not os.path.isdir(directory):
+            self.cache_cleanup()
+            try:
+                os.makedirs(directory, 0o700)
+            except OSError:
+                pass
+
+        try:
+            stat = os.stat(directory)
+        except OSError:
+            return None
+
+        # Never read or write results shared with another user.
+        if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+            return None
+
+        return directory
+
+    def cache_cleanup(self):
+
+        # Remove the caches of earlier runs whose playbook process has exited.
+        base = tempfile.gettempdir()
+        prefix = self.prefix + str(os.getuid()) + '-'
+
+        for name in os.listdir(base):
+            if not name.startswith(prefix) or not name[len(prefix):].isdigit():
+                continue
+            try:
+                os.kill(int(name[len(prefix):]), 0)
+            except OSError as error:
+                if error.errno == errno.ESRCH:
+                    shutil.rmtree(os.path.join(base, name), True)
+
+    def cache_get(self, key, ttl):
+
+        if key in self.memo and self.memo[key][0] + ttl > time.time():
+            return self.memo[key][1]
+
+        directory = self.cache_directory()
+
+        if directory is None:
+            return None
+
+        path = os.path.join(directory, key + '.json')
+
+        try:
+            modified = os.path.getmtime(path)
+            if modified + ttl > time.time():
+                with open(path) as handle:
+                    value = json.load(handle)
+                self.memo[key] = (modified, value)
+                return value
+            os.remove(path)
+        except (IOError, OSError, ValueError):
+            pass
+
+        return None
+
+    def cache_set(self, key, value):
+
+        self.memo[key] = (time.time(), value)
+        directory = self.cache_directory()
+
+        if directory is None:
+            return
+
+        try:
+            handle, temporary = tempfile.mkstemp(dir=directory)
+            with os.fdopen(handle, 'w') as stream:
+                json.dump(value, stream)
+            os.rename(temporary, os.path.join(directory, key + '.json'))
+        except (IOError, OSError):
+            pass
+
+    def run(self, terms, variables=None, **kwargs):
+
+        params = {
+            'admin_url': kwargs.get('admin_url', 'http://localhost:8001'),
+            'url_username': kwargs.get('admin_username', None),
+            'url_password': kwargs.get('admin_password', None),
+            'validate_certs': kwargs.get('validate_certs', True),
+        }
+        cache = kwargs.get('cache', True)
+        ttl = int(kwargs.get('cache_ttl', 300))
+
+        api = KongLookupApi(KongLookupModule(params))
+        results = []
+
+        for term in terms:
+            identity = params['admin_url'] + ' ' + str(params['url_username']) + ' ' + term
+            key = hashlib.sha1(identity.encode('utf-8')).hexdigest()
+            value = self.cache_get(key, ttl) if cache else None
+
+            if value is None:
+                try:
+                    value = api.read(term)
+                except ValueError as error:
+                    raise AnsibleError(str(error))
+                if cache:
+                    self.cache_set(key, value)
+
+            results.append(value)
+
+        return results
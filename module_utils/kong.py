@@ -3,18 +3,112 @@
 # Copyright (c) Ontic. (http://www.ontic.com.au). All rights reserved.
 # See the COPYING file bundled with this package for license details.
 
-import json, time
+import errno, gzip, hashlib, heapq, json, os, re, shutil, tempfile, threading, time
 from uuid import UUID, uuid3
+from multiprocessing.pool import ThreadPool
 from ansible.module_utils.urls import fetch_url
+from ansible.module_utils._text import to_text
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.module_utils.six import string_types
+from ansible.module_utils.six.moves.urllib.parse import quote, urlsplit
+
+class KongLimiter(object):
+
+    def __init__(self, rate=0, in_flight=0, latency=0):
+
+        # A rate of zero disables the token bucket and an in-flight value of
+        # zero disables the concurrency limit. Both are adjusted using an
+        # additive increase, multiplicative decrease strategy whenever the
+        # latency threshold (in milliseconds) is exceeded or Kong responds
+        # with a server error.
+        self.rate = float(rate or 0)
+        self.in_flight = int(in_flight or 0)
+        self.latency = float(latency or 0) / 1000
+        self.current_rate = self.rate
+        self.current_in_flight = self.in_flight
+        self.tokens = min(self.rate, 1.0)
+        self.timestamp = time.time()
+        self.active = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+
+        with self.condition:
+            while self.current_in_flight and self.active >= self.current_in_flight:
+                self.condition.wait()
+
+            self.active += 1
+
+            while self.current_rate:
+                now = time.time()
+                self.tokens = min(max(self.current_rate, 1.0), self.tokens + (now - self.timestamp) * self.current_rate)
+                self.timestamp = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+
+                self.condition.wait((1 - self.tokens) / self.current_rate)
+
+    def release(self, elapsed, status):
+
+        with self.condition:
+            self.active -= 1
+
+            if status < 0 or status >= 500 or (self.latency and elapsed > self.latency):
+                if self.rate:
+                    self.current_rate = max(self.rate / 10, self.current_rate / 2)
+                if self.in_flight:
+                    self.current_in_flight = max(1, self.current_in_flight // 2)
+            else:
+                if self.rate:
+                    self.current_rate = min(self.rate, self.current_rate + self.rate / 10)
+                if self.in_flight:
+                    self.current_in_flight = min(self.in_flight, self.current_in_flight + 1)
+
+            self.condition.notify_all()
+
+class KongBatchModule(object):
+
+    # Provides an AnsibleModule with the parameters of a single entity of
+    # a batch, delegating everything else to the module being executed.
+    def __init__(self, module, params):
+
+        self.module = module
+        self.params = params
+
+    def __getattr__(self, name):
+
+        return getattr(self.module, name)
 
 class KongApi(object):
 
+    # The collection of the entities managed by this API.
+    collection = None
+
+    # The collections referencing an entity of a collection through a
+    # field, which must be deleted before the entity itself.
+    dependents = {
+        'services': [('routes', 'service'), ('plugins', 'service_id')],
+        'routes': [('plugins', 'route_id')],
+        'consumers': [('plugins', 'consumer_id')],
+    }
+
     def __init__(self, module):
 
         self.module = module
         self.action = module.params.get('action')
+        self.concurrency = module.params.get('concurrency', None) or 1
+        self.limiter = KongLimiter(
+            module.params.get('rate_limit', None),
+            module.params.get('max_in_flight', None),
+            module.params.get('latency_threshold', None)
+        )
         self.data = {}
         self.ignore = []
+        self.indexes = {}
+        self.resources = {}
+        self.lock = threading.Lock()
 
         for name in module.argument_spec:
             value = module.params.get(name, None)
@@ -85,24 +179,80 @@ class KongApi(object):
 
         return dictionary1 != dictionary2
 
-    def url(self, path):
+    def equal(self, declared, actual):
 
-        url = self.module.params['admin_url'] + path
+        if isinstance(actual, list) and not isinstance(declared, list):
+            declared = [value.strip() for value in to_text(declared).split(',')]
+        if isinstance(declared, list) and isinstance(actual, list):
+            return len(declared) == len(actual) and all(self.equal(*values) for values in zip(declared, actual))
+        if isinstance(declared, dict) or isinstance(actual, dict):
+            return declared == actual
+        if isinstance(declared, bool) or isinstance(actual, bool):
+            return to_text(declared).lower() == to_text(actual).lower()
+        if declared is None or actual is None:
+            return declared is actual
 
-        return url.format(**self.data)
+        return to_text(declared) == to_text(actual)
 
-    def request(self, path, method, data=None):
+    def differences(self, declared, actual, prefix=''):
 
-        if data is not None:
-            data = json.dumps(data)
+        # Only declared fields are compared, so defaults applied by Kong are
+        # not reported. Nested objects such as plugin configs are compared
+        # field by field.
+        fields = {}
 
-        output, info = fetch_url(self.module, self.url(path), data, {'Content-type': 'application/json'}, method)
+        for name, value in declared.items():
+            if name in self.ignore or name in ('created_at', 'updated_at'):
+                continue
+            current = actual.get(name, None)
+            if isinstance(value, dict) and isinstance(current, dict):
+                fields.update(self.differences(value, current, prefix + name + '.'))
+            elif not self.equal(value, current):
+                fields[prefix + name] = {'declared': value, 'actual': current}
+
+        return fields
+
+    def url(self, path, fields=None, base=None):
+
+        url = (base or self.module.params['admin_url']) + path
+
+        if fields is None:
+            fields = self.data
+
+        return url.format(**fields)
+
+    def fetch(self, url, data, headers, method):
+
+        return fetch_url(self.module, url, data, headers, method)
+
+    def send(self, url, data, headers, method):
+
+        # Every request to Kong goes through the limiter, returning the raw
+        # content of the response along with its info.
+        self.limiter.acquire()
+        started = time.time()
+        status = -1
+
+        try:
+            output, info = self.fetch(url, data, headers, method)
+            status = info['status']
+        finally:
+            self.limiter.release(time.time() - started, status)
 
         try:
             content = output.read()
         except AttributeError:
             content = info.pop('body', '')
 
+        return content, info
+
+    def request(self, path, method, data=None, fields=None, base=None, headers=None):
+
+        if data is not None:
+            data = json.dumps(data)
+
+        content, info = self.send(self.url(path, fields, base), data, dict(headers or {}, **{'Content-type': 'application/json'}), method)
+
         try:
             response = json.loads(content)
         except ValueError:
@@ -115,215 +265,2200 @@ class KongApi(object):
             'response': response
         }
 
-    def request_read(self, path):
+    def paginate(self, path, fields=None, size=1000):
 
-        result = self.request(path, 'GET')
-        result['changed'] = False
-        result['failed'] = result['status'] >= 400
+        # Follow the `offset` cursor returned by Kong so that entire
+        # collections can be walked one page at a time.
+        separator = '&' if '?' in path else '?'
+        offset = None
 
-        return result
+        while True:
+            page = path + separator + 'size=' + str(size)
 
-    def request_create(self, path):
+            if offset is not None:
+                page += '&offset=' + quote(str(offset))
 
-        exists = self.find()
-        result = self.request(path, 'PUT', self.data)
-        result['changed'] = exists['status'] != 200 or self.changed(exists['response'], result['response'])
-        result['failed'] = result['status'] >= 400
+            result = self.request(page, 'GET', fields=fields)
 
-        return result
+            if result['status'] >= 400:
+                raise ValueError('Unable to list "' + result['url'] + '": ' + str(result['message']))
 
-    def request_delete(self, path):
+            for data in result['response'].get('data', []):
+                yield data
 
-        exists = self.find()
-        result = self.request(path, 'DELETE')
-        result['failed'] = result['status'] >= 400
-        result['changed'] = exists['status'] == 200 and result['status'] == 204
-        result['response'] = {}
+            offset = result['response'].get('offset', None)
 
-        if exists['status'] == 200:
-            result['response'] = exists['response']
+            if offset is None:
+                break
 
-        return result
+    def match(self, data, filters):
 
+        # Foreign keys are matched on their identifier, which may be given
+        # either as a UUID or as the name which is converted into one.
+        for name, value in filters.items():
+            field = data.get(name, None)
+            value = str(value)
+            if isinstance(field, dict):
+                field = field.get('id', None)
+            if isinstance(field, bool):
+                field = str(field).lower()
+                value = value.lower()
+            if isinstance(field, list):
+                if value not in [str(item) for item in field]:
+                    return False
+            elif field is None or str(field) not in (value, self.uuid(value)):
+                return False
 
-class KongNodeApi(KongApi):
+        return True
 
-    def information(self):
-        return self.request_read('/')
+    def parallel(self, function, items):
 
-    def status(self):
-        return self.request_read('/status')
+        items = list(items)
 
-class KongServiceApi(KongApi):
+        if self.concurrency <= 1 or len(items) <= 1:
+            return [function(item) for item in items]
 
-    def create(self):
-        return self.request_create('/services/{id}')
+        pool = ThreadPool(min(self.concurrency, len(items)))
 
-    def delete(self):
-        return self.request_delete('/services/{id}')
+        try:
+            return pool.map(function, items)
+        finally:
+            pool.close()
+            pool.join()
+
+    def poll(self, check, timeout, delay=1, maximum=30):
+
+        # Call check with an exponential backoff until it returns a true
+        # value or the timeout elapses, returning the last value and the
+        # number of seconds waited.
+        started = time.time()
+        deadline = started + timeout
+
+        while True:
+            value = check()
+            if value or time.time() >= deadline:
+                return value, time.time() - started
+            time.sleep(max(0, min(delay, maximum, deadline - time.time())))
+            delay *= 2
+
+    def sample(self):
+
+        # Kong only exposes connection and request counters through /status,
+        # error and latency counters require the Prometheus plugin.
+        status = self.request('/status', 'GET', fields={})
+        server = status['response'].get('server', {})
+        sample = {
+            'time': time.time(),
+            'reachable': status['status'] == 200 and status['response'].get('database', {}).get('reachable', True),
+            'requests': server.get('total_requests', 0),
+            'connections': server.get('connections_active', 0),
+            'writing': server.get('connections_writing', 0),
+        }
+        path = self.module.params.get('metrics_path', None)
+        service = self.module.params.get('metrics_service', None)
 
-    def find(self):
-        return self.request_read('/services/{id}')
+        if not path:
+            return sample
 
-    def routes(self):
-        return self.request_read('/services/{id}/routes')
+        content, info = self.send(self.url(path, {}), None, {}, 'GET')
 
-    def plugins(self):
-        return self.request_read('/services/{id}/plugins')
+        sample.update({'responses': 0, 'errors': 0, 'latency_sum': 0, 'latency_count': 0})
 
-    def list(self):
-        return self.request_read('/services')
+        for line in to_text(content).splitlines():
+            match = re.match(r'^(\w+)(?:\{(.*)\})?\s+(\S+)$', line)
+            if match is None:
+                continue
+            name, labels, value = match.group(1), dict(re.findall(r'(\w+)="([^"]*)"', match.group(2) or '')), float(match.group(3))
+            if service is not None and labels.get('service', None) != service:
+                continue
+            if name == 'kong_http_status':
+                sample['responses'] += value
+                if labels.get('code', '').startswith('5'):
+                    sample['errors'] += value
+            elif name == 'kong_latency_sum' and labels.get('type', None) == 'upstream':
+                sample['latency_sum'] += value
+            elif name == 'kong_latency_count' and labels.get('type', None) == 'upstream':
+                sample['latency_count'] += value
 
-class KongRouteApi(KongApi):
+        return sample
 
-    def create(self):
-        return self.request_create('/routes/{id}')
+    def fingerprint(self, value):
 
-    def delete(self):
-        return self.request_delete('/routes/{id}')
+        return hashlib.sha1(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()
 
-    def find(self):
-        return self.request_read('/routes/{id}')
+    def store(self, path, value):
 
-    def plugins(self):
-        return self.request_read('/routes/{id}/plugins')
+        # Atomically write a value as JSON, returning the number of bytes.
+        content = json.dumps(value, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        directory = os.path.dirname(os.path.abspath(path))
 
-    def list(self):
-        return self.request_read('/routes')
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
 
-class KongConsumerApi(KongApi):
+        handle, temporary = tempfile.mkstemp(dir=directory)
 
-    def create(self):
-        return self.request_create('/consumers/{id}')
+        with os.fdopen(handle, 'wb') as stream:
+            stream.write(content)
 
-    def delete(self):
-        return self.request_delete('/consumers/{id}')
+        os.rename(temporary, path)
 
-    def find(self):
-        return self.request_read('/consumers/{id}')
+        return len(content)
 
-    def plugins(self):
-        return self.request_read('/consumers/{id}/plugins')
+    def cached(self, path, fields):
 
-    def list(self):
-        return self.request_read('/consumers')
+        # Read a rarely changing resource once per module invocation, also
+        # keeping it on disk for the number of seconds given by the
+        # schema_cache_ttl option.
+        url = self.url(path, fields)
 
-class KongPluginApi(KongApi):
+        with self.lock:
+            if url not in self.resources:
+                self.resources[url] = self.fetch_cached(path, fields)
 
-    def create(self):
-        # We cannot use our typical request_create function as not all
-        # API end-points have been updated in Kong to support the PUT method.
-        exists = self.find()
+        return self.resources[url]
 
-        if exists['status'] == 200:
-            result = self.request('/plugins/{id}', 'PATCH', self.data)
-            result['changed'] = self.changed(exists['response'], result['response'])
-        else:
-            result = self.request('/plugins', 'POST', self.data)
-            result['changed'] = result['status'] == 201
+    def fetch_cached(self, path, fields):
 
-        result['failed'] = result['status'] >= 400
+        directory = self.module.params.get('schema_cache_path', None)
+        ttl = self.module.params.get('schema_cache_ttl', None) or 0
+        cache = None
+
+        if directory:
+            cache = os.path.join(os.path.expanduser(directory), self.fingerprint([self.module.params['admin_url'], self.url(path, fields)]) + '.json')
+            try:
+                if os.path.getmtime(cache) + ttl > time.time():
+                    with open(cache) as handle:
+                        return json.load(handle)
+            except (IOError, OSError, ValueError):
+                pass
+
+        result = self.request(path, 'GET', fields=fields)
+
+        if result['status'] >= 400:
+            raise ValueError('Unable to read "' + result['url'] + '": ' + str(result['message']))
+
+        if cache is not None:
+            try:
+                self.store(cache, result['response'])
+            except (IOError, OSError):
+                pass
+
+        return result['response']
+
+    def state(self, path, fields=None):
+
+        directory = self.module.params.get('state_path', None)
+
+        if not directory:
+            return None
+
+        return os.path.join(os.path.expanduser(directory), self.fingerprint([self.module.params['admin_url'], self.url(path, fields)]) + '.json')
+
+    def recall(self, path):
+
+        # Skip the Admin API entirely when the desired state matches the one
+        # last applied, unless the entity is due to be verified again.
+        state = self.state(path)
+
+        if state is None:
+            return None
+
+        try:
+            with open(state) as handle:
+                remembered = json.load(handle)
+        except (IOError, OSError, ValueError):
+            return None
+
+        ttl = self.module.params.get('state_ttl', None) or 0
+
+        if remembered.get('data') != self.fingerprint(self.data) or remembered.get('verified', 0) + ttl < time.time():
+            return None
+
+        return {
+            'message': 'OK (state)',
+            'status': 200,
+            'url': self.url(path),
+            'response': remembered.get('response', {}),
+            'changed': False,
+            'failed': False
+        }
+
+    def remember(self, path, result):
+
+        state = self.state(path)
+
+        if state is None or result['failed']:
+            return result
+
+        remembered = {
+            'data': self.fingerprint(self.data),
+            'hash': self.fingerprint(result['response']),
+            'response': result['response'],
+            'verified': time.time()
+        }
+
+        try:
+            self.store(state, remembered)
+        except (IOError, OSError):
+            pass
 
         return result
 
-    def delete(self):
-        return self.request_delete('/plugins/{id}')
+    def forget(self, path, fields=None):
 
-    def find(self):
-        return self.request_read('/plugins/{id}')
+        state = self.state(path, fields)
 
-    def enabled(self):
-        return self.request_read('/plugins/enabled')
+        if state is not None and os.path.exists(state):
+            os.remove(state)
 
-    def list(self):
-        return self.request_read('/plugins')
+    def split(self, data):
 
-class KongUpstreamApi(KongApi):
+        # The service url field is a convenience which Kong splits into the
+        # protocol, host, port and path fields.
+        data = data.copy()
 
-    def create(self):
-        # We cannot use our typical request_create function as not all
-        # API end-points have been updated in Kong to support the PUT method.
-        exists = self.find()
+        if 'url' in data:
+            url = urlsplit(data.pop('url'))
+            data['protocol'] = url.scheme
+            data['host'] = url.hostname
+            data['port'] = url.port or (443 if url.scheme == 'https' else 80)
+            if url.path:
+                data['path'] = url.path
 
-        if exists['status'] == 200:
-            result = self.request('/upstreams/{id}', 'PATCH', self.data)
-            result['changed'] = self.changed(exists['response'], result['response'])
+        return data
+
+    def expected(self):
+
+        return self.data
+
+    def simulate(self, exists, data=None):
+
+        # Compute the outcome of a write from the entity already read by
+        # find(), without sending the write itself.
+        before = exists['response'] if exists['status'] == 200 else {}
+
+        if data is None:
+            after = {}
+            changed = exists['status'] == 200
         else:
-            result = self.request('/upstreams', 'POST', self.data)
-            result['changed'] = result['status'] == 201
+            after = before.copy()
+            after.update(data)
+            changed = exists['status'] != 200 or len(self.differences(data, before)) > 0
 
-        result['failed'] = result['status'] >= 400
+        return {
+            'message': 'OK (check mode)',
+            'status': exists['status'],
+            'url': exists['url'],
+            'response': before if data is None else after,
+            'changed': changed,
+            'failed': False
+        }
+
+    def diff(self, exists, result, deleted=False):
+
+        if getattr(self.module, '_diff', False) and not result['failed']:
+            result['diff'] = {
+                'before': exists['response'] if exists['status'] == 200 else {},
+                'after': {} if deleted else result['response']
+            }
 
         return result
 
-    def delete(self):
-        return self.request_delete('/upstreams/{id}')
+    def project(self, data, fields):
 
-    def find(self):
-        return self.request_read('/upstreams/{id}')
+        projection = {}
 
-    def health(self):
-        return self.request_read('/upstreams/{id}/health')
+        for field in fields:
+            source = data
+            target = projection
+            names = field.split('.')
+            for name in names[:-1]:
+                if not isinstance(source, dict) or not isinstance(source.get(name, None), dict):
+                    source = None
+                    break
+                source = source[name]
+                target = target.setdefault(name, {})
+            if isinstance(source, dict) and names[-1] in source:
+                target[names[-1]] = source[names[-1]]
 
-    def list(self):
-        return self.request_read('/upstreams')
+        return projection
 
-class KongTargetApi(KongApi):
+    def shorten(self, response, summary):
 
-    def create(self):
-        # We cannot use our typical request_create function as not all
-        # API end-points have been updated in Kong to support the PUT method.
-        # This is probably one of the oddest API endpoints getting around.
-        exists = self.find()
+        if summary and isinstance(response.get('data', None), list):
+            shortened = {'total': len(response['data']), 'ids': [data.get('id', None) for data in response['data']]}
+            if 'offset' in response:
+                shortened['offset'] = response['offset']
+            return shortened
 
-        if exists['status'] == 200:
-            result = exists
+        if summary:
+            return {'id': response.get('id', None)}
+
+        return response
+
+    def output(self, result):
+
+        # Trim the response of read actions before it is returned to the
+        # controller, optionally keeping it on the host executing the module.
+        fields = self.module.params.get('fields', None)
+        summary = self.module.params.get('summary_only', False)
+        path = self.module.params.get('output_file', None)
+
+        if self.action in ('create', 'delete', 'healthy', 'unhealthy', 'cutover', 'shift', 'drain') or 'response' not in result:
+            return result
+
+        response = result['response']
+        batch = self.entities() is not None and isinstance(response.get('results', None), list)
+
+        if result.get('failed', False) and not batch:
+            return result
+
+        collection = isinstance(response.get('data', None), list)
+
+        if fields and batch:
+            response = dict(response, results=[dict(item, response=self.project(item['response'], fields)) if 'response' in item and not item['failed'] else item for item in response['results']])
+        elif fields and collection:
+            response = dict(response, data=[self.project(data, fields) for data in response['data']])
+        elif fields:
+            response = self.project(response, fields)
+
+        if path:
+            result['output_file'] = {'path': path, 'bytes': self.store(path, response)}
+
+        if batch:
+            response = dict(response, results=[dict(item, response=self.shorten(item['response'], summary)) if 'response' in item and not item['failed'] else item for item in response['results']])
         else:
-            result = self.request('/upstreams/{upstream_id}/targets', 'POST', self.data)
-            result['changed'] = result['status'] == 201
-            result['failed'] = result['status'] >= 400
+            response = self.shorten(response, summary)
+
+        result['response'] = {} if path and not summary else response
 
         return result
 
-    def delete(self):
-        return self.request_delete('/upstreams/{upstream_id}/targets/{target}')
+    def entities(self):
 
-    def find(self):
+        # The entities of a batch, given either as identifiers or as
+        # dictionaries of module options.
+        params = self.module.params
+
+        if params.get('entities', None):
+            return params['entities']
+        if params.get('ids', None):
+            return [{'id': value} for value in params['ids']]
+
+        return None
+
+    def validate(self):
+
+        # Check the options of an entity before anything is written.
+        return self
+
+    def coerce(self, name, value):
+
+        # Convert an option of a batch entity the way AnsibleModule converts
+        # the options given to the module itself.
+        spec = self.module.argument_spec[name]
+        kind = spec.get('type', 'str')
+
+        if value is None:
+            return None
+
+        try:
+            if kind == 'list' and isinstance(value, string_types):
+                value = [item.strip() for item in value.split(',')]
+            elif kind == 'list' and not isinstance(value, list):
+                value = [value]
+            elif kind == 'bool':
+                value = boolean(value)
+            elif kind == 'int' and not isinstance(value, bool):
+                value = int(value)
+            elif kind == 'float' and not isinstance(value, bool):
+                value = float(value)
+            elif kind == 'dict' and isinstance(value, string_types):
+                value = json.loads(value)
+            elif kind in ('str', 'path') and not isinstance(value, string_types):
+                value = to_text(value)
+        except (TypeError, ValueError):
+            raise ValueError('The entity option "' + name + '" must be of type ' + kind)
+
+        if (kind in ('int', 'float') and isinstance(value, bool)) or (kind == 'dict' and not isinstance(value, dict)):
+            raise ValueError('The entity option "' + name + '" must be of type ' + kind)
+        if kind == 'path':
+            value = os.path.expanduser(os.path.expandvars(value))
+
+        choices = spec.get('choices', None)
+
+        if choices and value not in choices:
+            raise ValueError('The entity option "' + name + '" must be one of: ' + ', '.join(to_text(choice) for choice in choices))
+
+        return value
+
+    def batch(self, perform):
+
+        # Perform an action for every entity of a batch in parallel within a
+        # single module invocation. Each entity is handled by its own API
+        # object sharing the rate limiter and natural key indexes.
+        entities = self.entities()
+        prune = self.action == 'create' and self.module.params.get('prune', False)
+
+        if entities is None and prune:
+            raise ValueError('The option "prune" requires either "ids" or "entities"')
+        if entities is None:
+            return self.verify(perform(self))
+
+        aliases = {}
+
+        for name, spec in self.module.argument_spec.items():
+            for alias in spec.get('aliases', None) or []:
+                aliases[alias] = name
+
+        def build(entity):
+            # Every entity is checked before any of them is applied, so an
+            # invalid entity fails the batch without a single write.
+            try:
+                if not isinstance(entity, dict):
+                    raise ValueError('Every entity must be a dictionary of options')
+                params = dict(self.module.params, id=None, ids=None, entities=None)
+                for name, value in entity.items():
+                    name = aliases.get(name, name)
+                    if name not in self.module.argument_spec or name in ('ids', 'entities', 'action'):
+                        raise ValueError('Unsupported entity option "' + name + '"')
+                    params[name] = self.coerce(name, value)
+                api = self.__class__(KongBatchModule(self.module, params))
+                api.limiter = self.limiter
+                api.indexes = self.indexes
+                api.resources = self.resources
+                api.lock = self.lock
+                if self.action == 'create':
+                    api.validate()
+                return api
+            except ValueError as error:
+                return {'message': str(error), 'failed': True, 'changed': False}
+
+        def run(api):
+            try:
+                return api.verify(perform(api))
+            except ValueError as error:
+                return {'message': str(error), 'failed': True, 'changed': False}
+
+        apis = self.parallel(build, entities)
+
+        if any(isinstance(api, dict) for api in apis):
+            skipped = {'message': 'Skipped as not every entity is valid', 'failed': False, 'changed': False}
+            results = [api if isinstance(api, dict) else dict(skipped) for api in apis]
+        else:
+            results = self.parallel(run, apis)
+
+        failed = len([result for result in results if result.get('failed', False)])
         result = {
-            'message': '404 Not Found',
-            'status': 404,
-            'url': self.url('/upstreams/{upstream_id}/targets'),
-            'response': {},
-            'changed': False,
-            'failed': True,
+            'message': 'OK' if not failed else str(failed) + ' of ' + str(len(results)) + ' entities failed',
+            'status': 200,
+            'url': self.module.params['admin_url'],
+            'changed': any(result.get('changed', False) for result in results),
+            'failed': failed > 0,
+            'response': {
+                'total': len(results),
+                'changed': len([result for result in results if result.get('changed', False)]),
+                'failed': failed,
+                'results': results
+            }
         }
 
-        targets = self.request('/upstreams/{upstream_id}/targets', 'GET', self.data)
-
-        if targets['status'] == 200:
-            for data in targets['response']['data']:
-                if data['target'] == self.data['target']:
-                    result['failed'] = False
-                    result['status'] = 200
-                    result['message'] = 'OK'
-                    result['response'] = data
-                    break
+        if prune and failed:
+            result['response']['pruned'] = {'message': 'Skipped as not every entity was applied', 'total': 0}
+        elif prune:
+            try:
+                pruned = self.prune(entities, results)
+            except ValueError as error:
+                pruned = {'message': str(error), 'total': 0, 'failed': True}
+            result['response']['pruned'] = pruned
+            result['changed'] = result['changed'] or pruned['total'] > 0
+            result['failed'] = pruned.get('failed', False)
+            result['message'] = pruned['message'] if result['failed'] else result['message']
 
         return result
 
-    def healthy(self):
-        result = self.request('/upstreams/{upstream_id}/targets/{target}/healthy', 'POST', self.data)
-        result['changed'] = result['status'] == 204
-        result['failed'] = result['status'] >= 400
+    def verify(self, result):
+
+        # Poll every node until a write is visible through its Admin API
+        # and, given a probe, through its proxy, measuring how long the
+        # change took to propagate.
+        params = self.module.params
+        nodes = params.get('verify_nodes', None)
+
+        if not nodes or self.action not in ('create', 'delete') or self.module.check_mode:
+            return result
+        if result.get('failed', False) or not result.get('changed', False) or not result['response'].get('id', None):
+            return result
+
+        deleted = self.action == 'delete'
+        probe = params.get('verify_probe', None) or {}
+        fields = {'id': result['response']['id']}
+        expected = self.fingerprint(result['response'])
+        started = time.time()
+
+        def admin(node):
+            read = self.request('/' + self.collection + '/{id}', 'GET', fields=fields, base=node['admin_url'])
+            if deleted:
+                return read['status'] == 404
+            return read['status'] == 200 and self.fingerprint(read['response']) == expected
+
+        def proxy(node):
+            read = self.request(probe.get('path', '/'), probe.get('method', 'GET'), fields={}, base=node['proxy_url'], headers=probe.get('headers', None))
+            if probe.get('status', None) is not None:
+                return read['status'] == int(probe['status'])
+            return (read['status'] == 404) == deleted and read['status'] > 0
+
+        def check(node):
+            if isinstance(node, string_types):
+                node = {'admin_url': node}
+            report = {'node': node['admin_url'], 'visible': False, 'admin': None, 'proxy': None}
+            visible, waited = self.poll(lambda: admin(node), params['verify_timeout'], 0.25, 5)
+            report['admin'] = round(waited, 3) if visible else None
+            if visible and node.get('proxy_url', None):
+                visible, waited = self.poll(lambda: proxy(node), max(0, params['verify_timeout'] - (time.time() - started)), 0.25, 5)
+                waited = time.time() - started
+                report['proxy'] = round(waited, 3) if visible else None
+            report['visible'] = bool(visible)
+            report['latency'] = round(waited, 3) if visible else None
+            return report
+
+        result['verified'] = self.parallel(check, nodes)
+        invisible = [report['node'] for report in result['verified'] if not report['visible']]
+
+        if invisible:
+            result['failed'] = True
+            result['message'] = 'The change is not visible on ' + ', '.join(invisible) + ' after ' + str(params['verify_timeout']) + ' seconds'
 
         return result
 
-    def unhealthy(self):
-        result = self.request('/upstreams/{upstream_id}/targets/{target}/unhealthy', 'POST', self.data)
-        result['changed'] = result['status'] == 204
+    def scope(self):
+
+        # The path, path fields and filters of the entities considered
+        # for pruning.
+        return '/' + self.collection, {}, {}
+
+    def reference(self, value):
+
+        return value.get('id', None) if isinstance(value, dict) else value
+
+    def prune(self, entities, results):
+
+        # Delete every entity of the collection not declared in the batch,
+        # along with the entities depending on it, dependents first.
+        params = self.module.params
+        declared = set()
+
+        for entity, result in zip(entities, results):
+            if isinstance(result.get('response', None), dict) and result['response'].get('id', None):
+                declared.add(result['response']['id'])
+            elif isinstance(entity, dict) and entity.get('id', None):
+                declared.add(self.uuid(to_text(entity['id'])))
+
+        path, fields, filters = self.scope()
+        filters = dict(filters, **(params.get('filter', None) or {}))
+        orphans = {self.collection: [data['id'] for data in self.paginate(path, fields) if data['id'] not in declared and self.match(data, filters)]}
+        listings = {}
+        pending = [self.collection]
+
+        while pending:
+            collection = pending.pop(0)
+            identifiers = set(orphans[collection])
+            for dependent, field in self.dependents.get(collection, []):
+                if not identifiers:
+                    continue
+                if dependent not in listings:
+                    listings[dependent] = list(self.paginate('/' + dependent, {}))
+                found = [data['id'] for data in listings[dependent] if self.reference(data.get(field, None)) in identifiers]
+                orphans[dependent] = sorted(set(orphans.get(dependent, []) + found))
+                pending.append(dependent)
+
+        total = sum(len(identifiers) for identifiers in orphans.values())
+        maximum = params.get('max_deletions', None)
+
+        if maximum is not None and total > maximum:
+            raise ValueError('Pruning would delete ' + str(total) + ' entities, more than the maximum of ' + str(maximum))
+
+        report = {
+            'message': 'OK',
+            'total': total,
+            'dry_run': self.module.check_mode,
+            'deleted': orphans,
+            'errors': []
+        }
+
+        if self.module.check_mode:
+            return report
+
+        def delete(item):
+            collection, identifier = item
+            self.forget('/' + collection + '/{id}', {'id': identifier})
+            result = self.request('/' + collection + '/{id}', 'DELETE', fields={'id': identifier})
+            if result['status'] >= 400 and result['status'] != 404:
+                return {'url': result['url'], 'status': result['status'], 'message': result['message']}
+            return None
+
+        for collection in ('plugins', 'routes', 'services', 'consumers', 'upstreams'):
+            items = [(collection, identifier) for identifier in orphans.get(collection, [])]
+            errors = [error for error in self.parallel(delete, items) if error is not None]
+            report['errors'].extend(errors)
+            # Entities are left in place when any of their dependents remain.
+            if errors:
+                break
+
+        if report['errors']:
+            report['message'] = str(len(report['errors'])) + ' deletion(s) failed'
+            report['failed'] = True
+
+        return report
+
+    def naturals(self):
+
+        # The fields identifying an entity when no id is given.
+        return []
+
+    def listing(self):
+
+        # The path, path fields and server-side filters of the collection
+        # searched for an entity by its natural key.
+        return None, {}, {}
+
+    def natural(self, data, names=None):
+
+        key = []
+
+        for name in self.naturals() if names is None else names:
+            value = data.get(name, None)
+            if isinstance(value, dict):
+                value = value.get('id', None)
+            if isinstance(value, list):
+                value = sorted(to_text(item) for item in value) or None
+            elif value is not None:
+                value = to_text(value)
+            key.append([name, value])
+
+        return json.dumps(key, sort_keys=True)
+
+    def identify(self):
+
+        # Look up an entity without an id by its natural key, using a single
+        # listing of the narrowest collection Kong can return. New entities
+        # are given an id derived from their natural key.
+        if 'id' in self.data or not self.naturals() or not any(name in self.data for name in self.naturals()):
+            return self
+
+        path, fields, filters = self.listing()
+        query = '&'.join(name + '=' + quote(to_text(value).encode('utf-8')) for name, value in sorted(filters.items()))
+        path = path + '?' + query if query else path
+
+        with self.lock:
+            if path not in self.indexes:
+                self.indexes[path] = dict((self.natural(data), data['id']) for data in self.paginate(path, fields))
+
+        key = self.natural(self.data)
+
+        if key in self.indexes[path]:
+            self.data['id'] = self.indexes[path][key]
+        elif self.action == 'create':
+            self.data['id'] = self.uuid(key)
+
+        return self
+
+    def request_read(self, path):
+
+        result = self.request(path, 'GET')
+        result['changed'] = False
         result['failed'] = result['status'] >= 400
 
         return result
 
-    def list(self):
-        return self.request_read('/upstreams/{upstream_id}/targets/all')
+    def request_list(self, path, supported=[]):
+
+        # Without a filter a single page is returned as before. Otherwise the
+        # whole collection is streamed, pushing the filters Kong supports
+        # into the query string and applying the others to every page.
+        filters = self.module.params.get('filter', None)
+
+        if not filters:
+            return self.request_read(path)
+
+        query = []
+
+        for name in sorted(filters):
+            if name in supported:
+                value = to_text(filters[name])
+                if name == 'id' or name.endswith('_id'):
+                    value = self.uuid(value)
+                query.append(name + '=' + quote(value.encode('utf-8')))
+
+        if query:
+            path += '?' + '&'.join(query)
+
+        data = [data for data in self.paginate(path) if self.match(data, filters)]
+
+        return {
+            'message': 'OK',
+            'status': 200,
+            'url': self.url(path),
+            'response': {'data': data, 'total': len(data)},
+            'changed': False,
+            'failed': False
+        }
+
+    def request_create(self, path):
+
+        remembered = self.recall(path)
+
+        if remembered is not None:
+            return remembered
+
+        exists = self.find()
+
+        if self.module.check_mode:
+            return self.diff(exists, self.simulate(exists, self.expected()))
+
+        result = self.request(path, 'PUT', self.data)
+        result['changed'] = exists['status'] != 200 or self.changed(exists['response'], result['response'])
+        result['failed'] = result['status'] >= 400
+
+        return self.remember(path, self.diff(exists, result))
+
+    def request_delete(self, path):
+
+        exists = self.find()
+
+        if self.module.check_mode:
+            return self.diff(exists, self.simulate(exists), True)
+
+        self.forget(path)
+        result = self.request(path, 'DELETE')
+        result['failed'] = result['status'] >= 400
+        result['changed'] = exists['status'] == 200 and result['status'] == 204
+        result['response'] = {}
+
+        if exists['status'] == 200:
+            result['response'] = exists['response']
+
+        return self.diff(exists, result, True)
+
+
+class KongNodeApi(KongApi):
+
+    def information(self):
+        return self.request_read('/')
+
+    def status(self):
+        return self.request_read('/status')
+
+class KongFactsApi(KongNodeApi):
+
+    def version(self):
+
+        # Reading the version from the installed Lua sources avoids starting
+        # the Kong CLI, which is only used when the sources cannot be found.
+        params = self.module.params
+
+        try:
+            with open(params['meta_file']) as handle:
+                content = handle.read()
+            parts = [re.search(r'\b' + name + r'\s*=\s*(\d+)', content) for name in ('major', 'minor', 'patch')]
+            if all(parts):
+                return '.'.join(part.group(1) for part in parts)
+        except (IOError, OSError):
+            pass
+
+        if not os.path.exists(params['binary_file']):
+            return None
+
+        rc, stdout, stderr = self.module.run_command([params['binary_file'], 'version'])
+        match = re.search(r'[0-9]+(\.[0-9]+)+', stdout)
+
+        return match.group(0) if rc == 0 and match else None
+
+    def pid(self, prefix_path):
+
+        try:
+            with open(os.path.join(prefix_path, 'pids', 'nginx.pid')) as handle:
+                pid = int(handle.read().strip())
+        except (IOError, OSError, ValueError):
+            return None
+
+        try:
+            os.kill(pid, 0)
+        except OSError as error:
+            # A process owned by another user still exists.
+            if error.errno != errno.EPERM:
+                return None
+
+        return pid
+
+    def digest(self, path):
+
+        if not path or not os.path.isfile(path):
+            return None
+
+        digest = hashlib.sha256()
+
+        with open(path, 'rb') as handle:
+            for block in iter(lambda: handle.read(65536), b''):
+                digest.update(block)
+
+        return digest.hexdigest()
+
+    def node(self, prefix_path, config_file, nginx_config_file):
+
+        pid = self.pid(prefix_path)
+
+        return {
+            'prepared': os.path.isdir(prefix_path),
+            'running': pid is not None,
+            'pid': pid,
+            'config_digest': self.digest(config_file),
+            'nginx_config_digest': self.digest(nginx_config_file),
+        }
+
+    def facts(self):
+
+        params = self.module.params
+        version = self.version()
+        facts = self.node(params['prefix_path'], params['config_file'], params['nginx_config_file'])
+        pid = facts['pid']
+        facts.update({
+            'installed': version is not None,
+            'version': version,
+            'admin_reachable': False,
+            'database_reachable': False,
+            'node': {},
+            'instances': {},
+        })
+
+        # Instances sharing the host are only inspected on disk, as their
+        # Admin API listeners may be shared through reuseport.
+        for instance in params.get('instances', None) or []:
+            if not isinstance(instance, dict) or 'name' not in instance or 'prefix_path' not in instance:
+                raise ValueError('Every instance must be a dictionary with a name and a prefix_path')
+            facts['instances'][instance['name']] = self.node(instance['prefix_path'], instance.get('config_file', None), instance.get('nginx_config_file', None))
+
+        # The Admin API is only requested when nginx is running, so a
+        # stopped node does not wait for a connection timeout.
+        if pid is not None:
+            information = self.information()
+            status = self.status()
+            facts['admin_reachable'] = information['status'] == 200
+            if information['status'] == 200:
+                facts['node'] = dict((name, information['response'].get(name, None)) for name in ('hostname', 'node_id', 'version', 'lua_version', 'tagline'))
+            if status['status'] == 200:
+                facts['database_reachable'] = status['response'].get('database', {}).get('reachable', False)
+                facts['node']['server'] = status['response'].get('server', {})
+
+        return {
+            'message': 'OK',
+            'changed': False,
+            'failed': False,
+            'ansible_facts': {'kong_facts': facts}
+        }
+
+class KongConfigFile(object):
+
+    def __init__(self, module):
+
+        self.module = module
+        self.path = module.params['path']
+
+    def value(self, value):
+
+        # Kong reads booleans as on/off, which YAML turns into booleans.
+        if isinstance(value, bool):
+            return 'on' if value else 'off'
+
+        return '' if value is None else to_text(value)
+
+    def merge(self, lines, options):
+
+        # Options are matched the same way as the ini_file module does,
+        # preferring an active setting over a commented-out default.
+        changes = []
+
+        for item in options:
+            if not isinstance(item, dict) or not item.get('option', None):
+                raise ValueError('Every item of "options" requires an "option" field')
+
+            option = item['option']
+            state = item.get('state', None) or 'present'
+            active = re.compile(r'^[ \t]*' + re.escape(option) + r'[ \t]*(=|$)')
+            commented = re.compile(r'^[#;][ \t]*' + re.escape(option) + r'[ \t]*(=|$)')
+            matches = [index for index, line in enumerate(lines) if active.match(line)]
+            before = [lines[index].split('=', 1)[-1].strip() for index in matches]
+
+            if state == 'absent':
+                if matches:
+                    lines = [line for index, line in enumerate(lines) if index not in matches]
+                    changes.append({'option': option, 'state': state, 'before': before[0], 'after': None})
+                continue
+
+            line = option + ' = ' + self.value(item.get('value', None)) + '\n'
+
+            if matches:
+                if lines[matches[0]].rstrip('\r\n') != line.rstrip('\n'):
+                    lines[matches[0]] = line
+                    changes.append({'option': option, 'state': state, 'before': before[0], 'after': self.value(item.get('value', None))})
+                continue
+
+            defaults = [index for index, line in enumerate(lines) if commented.match(line)]
+
+            if defaults:
+                lines[defaults[0]] = line
+            else:
+                if lines and not lines[-1].endswith('\n'):
+                    lines[-1] += '\n'
+                lines.append(line)
+
+            changes.append({'option': option, 'state': state, 'before': None, 'after': self.value(item.get('value', None))})
+
+        return lines, changes
+
+    def apply(self):
+
+        params = self.module.params
+        content = ''
+
+        if os.path.isfile(self.path):
+            with open(self.path, 'rb') as handle:
+                content = to_text(handle.read(), errors='surrogate_or_strict')
+
+        lines, changes = self.merge(content.splitlines(True), params['options'] or [])
+        merged = ''.join(lines)
+        encoded = merged.encode('utf-8')
+        result = {
+            'message': 'OK',
+            'path': self.path,
+            'changed': merged != content,
+            'failed': False,
+            'changes': changes,
+            'config_digest': hashlib.sha256(encoded).hexdigest()
+        }
+
+        if self.module._diff:
+            result['diff'] = {'before': content, 'after': merged, 'before_header': self.path, 'after_header': self.path}
+
+        if result['changed'] and not self.module.check_mode:
+            # All options are written at once, replacing the file atomically.
+            handle, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)))
+            with os.fdopen(handle, 'wb') as stream:
+                stream.write(encoded)
+            self.module.atomic_move(temporary, self.path)
+
+        attributes = self.module.load_file_common_arguments(params)
+        result['changed'] = self.module.set_fs_attributes_if_different(attributes, result['changed'])
+
+        return result
+
+class KongServiceApi(KongApi):
+
+    collection = 'services'
+
+    def create(self):
+        return self.request_create('/services/{id}')
+
+    def delete(self):
+        return self.request_delete('/services/{id}')
+
+    def find(self):
+        return self.request_read('/services/{id}')
+
+    def routes(self):
+        return self.request_read('/services/{id}/routes')
+
+    def plugins(self):
+        return self.request_read('/services/{id}/plugins')
+
+    def list(self):
+        return self.request_read('/services')
+
+    def expected(self):
+        return self.split(self.data)
+
+    def cutover(self):
+
+        # Repoint every route of this service to the destination service
+        # concurrently, keeping the window of mixed routing short.
+        if self.module.params.get('destination', None) is None:
+            raise ValueError('The option "destination" is required')
+
+        destination = self.uuid(self.module.params['destination'])
+        exists = self.request('/services/{id}', 'GET', fields={'id': destination})
+
+        if exists['status'] != 200:
+            raise ValueError('The destination service "' + self.module.params['destination'] + '" does not exist')
+
+        routes = [route['id'] for route in self.paginate('/services/{id}/routes')]
+        started = time.time()
+        errors = []
+
+        if not self.module.check_mode:
+            def repoint(route):
+                return self.request('/routes/{id}', 'PATCH', {'service': {'id': destination}}, {'id': route})
+
+            for result in self.parallel(repoint, routes):
+                if result['status'] >= 400:
+                    errors.append({'url': result['url'], 'status': result['status'], 'message': result['message'], 'response': result['response']})
+
+        duration = time.time() - started
+        remaining = [route['id'] for route in self.paginate('/services/{id}/routes')] if not self.module.check_mode else []
+        moved = set(route['id'] for route in self.paginate('/services/{id}/routes', {'id': destination}))
+        failed = len(errors) > 0 or len(remaining) > 0 or (not self.module.check_mode and not set(routes) <= moved)
+
+        return {
+            'message': 'Cutover incomplete' if failed else 'OK',
+            'status': 200,
+            'url': self.url('/services/{id}/routes'),
+            'changed': len(routes) > len(errors),
+            'failed': failed,
+            'response': {
+                'source': self.data['id'],
+                'destination': destination,
+                'routes': routes,
+                'remaining': remaining,
+                'errors': errors,
+                'duration': round(duration, 3)
+            }
+        }
+
+class KongRouteApi(KongApi):
+
+    collection = 'routes'
+
+    def create(self):
+        return self.request_create('/routes/{id}')
+
+    def delete(self):
+        return self.request_delete('/routes/{id}')
+
+    def find(self):
+        return self.request_read('/routes/{id}')
+
+    def plugins(self):
+        return self.request_read('/routes/{id}/plugins')
+
+    def list(self):
+        return self.request_list('/routes')
+
+    def naturals(self):
+        return ['service', 'hosts', 'paths', 'methods']
+
+    def listing(self):
+        if 'service' in self.data:
+            return '/services/{service}/routes', {'service': self.data['service']['id']}, {}
+        return '/routes', {}, {}
+
+    def scope(self):
+        return self.listing()
+
+class KongConsumerApi(KongApi):
+
+    collection = 'consumers'
+
+    def create(self):
+        return self.request_create('/consumers/{id}')
+
+    def delete(self):
+        return self.request_delete('/consumers/{id}')
+
+    def find(self):
+        return self.request_read('/consumers/{id}')
+
+    def plugins(self):
+        return self.request_read('/consumers/{id}/plugins')
+
+    def list(self):
+        return self.request_list('/consumers', ['id', 'username', 'custom_id'])
+
+    def naturals(self):
+        return ['username'] if 'username' in self.data else ['custom_id']
+
+    def listing(self):
+        name = self.naturals()[0]
+        return '/consumers', {}, {name: self.data[name]}
+
+class KongCredentialApi(KongConsumerApi):
+
+    # The field which uniquely identifies a credential of a given type.
+    identifiers = {
+        'key-auth': 'key',
+        'basic-auth': 'username',
+        'jwt': 'key',
+        'acl': 'group',
+    }
+
+    # Fields which Kong stores in a form that cannot be compared.
+    secrets = {
+        'basic-auth': ['password'],
+    }
+
+    def __init__(self, module):
+
+        super(KongCredentialApi, self).__init__(module)
+
+        self.credentials = []
+
+        for index, item in enumerate(module.params.get('credentials', None) or []):
+            if not isinstance(item, dict):
+                module.fail_json(msg='The credential at index ' + str(index) + ' must be a dictionary of options, got "' + to_text(item) + '"')
+            credential = dict(item)
+            if 'consumer' not in credential or 'type' not in credential:
+                raise ValueError('Every credential requires the "consumer" and "type" options')
+            if credential['type'] not in self.identifiers:
+                raise ValueError('The credential type "' + credential['type'] + '" is not supported')
+            if self.identifiers[credential['type']] not in credential:
+                raise ValueError('The option "' + self.identifiers[credential['type']] + '" is required for "' + credential['type'] + '" credentials')
+            credential['consumer'] = self.uuid(str(credential['consumer']))
+            self.credentials.append(credential)
+
+    def fields(self, credential):
+
+        return dict((name, value) for name, value in credential.items() if name not in ('consumer', 'type'))
+
+    def index(self):
+
+        # Prefetch the existing credentials once for every consumer and type
+        # pair, indexed by the identifying field of each credential type.
+        pairs = sorted(set((credential['consumer'], credential['type']) for credential in self.credentials))
+
+        def fetch(pair):
+            identifier = self.identifiers[pair[1]]
+            existing = {}
+            for data in self.paginate('/consumers/{consumer}/{type}', {'consumer': pair[0], 'type': pair[1]}):
+                existing[data.get(identifier)] = data
+            return pair, existing
+
+        return dict(self.parallel(fetch, pairs))
+
+    def apply(self, operations):
+
+        if self.module.check_mode:
+            return []
+
+        def execute(operation):
+            method, path, fields, data = operation
+            result = self.request(path, method, data, fields)
+            if result['status'] >= 400:
+                return {'url': result['url'], 'status': result['status'], 'message': result['message'], 'response': result['response']}
+            return None
+
+        return [error for error in self.parallel(execute, operations) if error is not None]
+
+    def summary(self, created, updated, deleted, unchanged, errors):
+
+        return {
+            'message': str(len(errors)) + ' credential request(s) failed' if errors else 'OK',
+            'changed': (created + updated + deleted - len(errors)) > 0,
+            'failed': len(errors) > 0,
+            'response': {
+                'created': created,
+                'updated': updated,
+                'deleted': deleted,
+                'unchanged': unchanged,
+                'errors': errors,
+            }
+        }
+
+    def create(self):
+
+        index = self.index()
+        operations = []
+        declared = set()
+        created = updated = deleted = unchanged = 0
+
+        for credential in self.credentials:
+            pair = (credential['consumer'], credential['type'])
+            identifier = self.identifiers[credential['type']]
+            fields = {'consumer': credential['consumer'], 'type': credential['type']}
+            data = self.fields(credential)
+            exists = index[pair].get(data[identifier], None)
+            declared.add(pair + (data[identifier],))
+
+            if exists is None:
+                operations.append(('POST', '/consumers/{consumer}/{type}', fields, data))
+                created += 1
+                continue
+
+            ignore = self.secrets.get(credential['type'], [])
+            compare = dict((name, value) for name, value in data.items() if name not in ignore)
+
+            if any(exists.get(name) != value for name, value in compare.items()):
+                fields['id'] = exists['id']
+                operations.append(('PATCH', '/consumers/{consumer}/{type}/{id}', fields, data))
+                updated += 1
+            else:
+                unchanged += 1
+
+        if self.module.params.get('exclusive', False):
+            for pair, existing in index.items():
+                for value, data in existing.items():
+                    if pair + (value,) not in declared:
+                        fields = {'consumer': pair[0], 'type': pair[1], 'id': data['id']}
+                        operations.append(('DELETE', '/consumers/{consumer}/{type}/{id}', fields, None))
+                        deleted += 1
+
+        return self.summary(created, updated, deleted, unchanged, self.apply(operations))
+
+    def delete(self):
+
+        index = self.index()
+        operations = []
+        unchanged = 0
+
+        for credential in self.credentials:
+            pair = (credential['consumer'], credential['type'])
+            value = credential[self.identifiers[credential['type']]]
+            exists = index[pair].pop(value, None)
+
+            if exists is None:
+                unchanged += 1
+                continue
+
+            fields = {'consumer': pair[0], 'type': pair[1], 'id': exists['id']}
+            operations.append(('DELETE', '/consumers/{consumer}/{type}/{id}', fields, None))
+
+        return self.summary(0, 0, len(operations), unchanged, self.apply(operations))
+
+class KongPluginApi(KongApi):
+
+    collection = 'plugins'
+
+    # Schema field types and the values accepted for them. Templated values
+    # arrive as strings, which Kong converts to numbers and booleans.
+    types = {
+        'string': lambda value: isinstance(value, string_types),
+        'url': lambda value: isinstance(value, string_types),
+        'number': lambda value: re.match(r'^-?[0-9]+(\.[0-9]+)?$', to_text(value)) is not None and not isinstance(value, bool),
+        'integer': lambda value: re.match(r'^-?[0-9]+$', to_text(value)) is not None and not isinstance(value, bool),
+        'timestamp': lambda value: re.match(r'^-?[0-9]+(\.[0-9]+)?$', to_text(value)) is not None and not isinstance(value, bool),
+        'boolean': lambda value: to_text(value).lower() in ('true', 'false'),
+        'array': lambda value: isinstance(value, (list, string_types)),
+        'set': lambda value: isinstance(value, (list, string_types)),
+        'table': lambda value: isinstance(value, dict),
+        'record': lambda value: isinstance(value, dict),
+        'map': lambda value: isinstance(value, dict),
+    }
+
+    def schema(self, fields):
+
+        # Kong 1.0 and later describe fields as a list of single entry
+        # dictionaries, nesting the plugin config within a record.
+        if isinstance(fields, list):
+            fields = dict(item for field in fields for item in field.items())
+            if isinstance(fields.get('config', None), dict) and fields['config'].get('type', None) == 'record':
+                return self.schema(fields['config'].get('fields', []))
+
+        return fields
+
+    def check(self, config, fields, prefix, errors):
+
+        for name, value in config.items():
+            field = fields.get(name, None)
+
+            if field is None:
+                errors.append(prefix + name + ' is not a known field')
+                continue
+            if value is None:
+                continue
+
+            kind = field.get('type', None)
+
+            if kind in self.types and not self.types[kind](value):
+                errors.append(prefix + name + ' must be of type ' + kind)
+                continue
+            if 'enum' in field or 'one_of' in field:
+                choices = field.get('enum', field.get('one_of', []))
+                values = value if isinstance(value, list) else [value]
+                if any(item not in choices for item in values):
+                    errors.append(prefix + name + ' must be one of ' + ', '.join(to_text(choice) for choice in choices))
+            if isinstance(value, dict) and ('schema' in field or 'fields' in field):
+                self.check(value, self.schema(field.get('schema', field).get('fields', {})), prefix + name + '.', errors)
+
+        for name, field in fields.items():
+            if field.get('required', False) and name not in config and field.get('default', None) is None:
+                errors.append(prefix + name + ' is required')
+
+        return errors
+
+    def validate(self):
+
+        # Batches validate every plugin before creating any of them, reading
+        # the enabled plugins and each schema only once.
+        if not self.module.params.get('validate_config', False) or 'name' not in self.data:
+            return self
+
+        enabled = self.cached('/plugins/enabled', {})
+
+        if self.data['name'] not in enabled.get('enabled_plugins', [self.data['name']]):
+            raise ValueError('The plugin "' + self.data['name'] + '" is not enabled')
+
+        schema = self.cached('/plugins/schema/{name}', {'name': self.data['name']})
+        errors = self.check(self.data.get('config', None) or {}, self.schema(schema.get('fields', {})), 'config.', [])
+
+        if errors:
+            raise ValueError('Invalid config for the plugin "' + self.data['name'] + '": ' + '; '.join(errors))
+
+        return self
+
+    def create(self):
+        # We cannot use our typical request_create function as not all
+        # API end-points have been updated in Kong to support the PUT method.
+        remembered = self.recall('/plugins/{id}')
+
+        if remembered is not None:
+            return remembered
+
+        self.validate()
+
+        exists = self.find()
+
+        if self.module.check_mode:
+            return self.diff(exists, self.simulate(exists, self.expected()))
+
+        if exists['status'] == 200:
+            result = self.request('/plugins/{id}', 'PATCH', self.data)
+            result['changed'] = self.changed(exists['response'], result['response'])
+        else:
+            result = self.request('/plugins', 'POST', self.data)
+            result['changed'] = result['status'] == 201
+
+        result['failed'] = result['status'] >= 400
+
+        return self.remember('/plugins/{id}', self.diff(exists, result))
+
+    def delete(self):
+        return self.request_delete('/plugins/{id}')
+
+    def find(self):
+        return self.request_read('/plugins/{id}')
+
+    def enabled(self):
+        return self.request_read('/plugins/enabled')
+
+    def list(self):
+        return self.request_list('/plugins', ['id', 'name', 'consumer_id', 'service_id', 'route_id'])
+
+    def naturals(self):
+        return ['name', 'service_id', 'route_id', 'consumer_id']
+
+    def listing(self):
+        return '/plugins', {}, dict((name, self.data[name]) for name in self.naturals() if name in self.data)
+
+    def scope(self):
+        return '/plugins', {}, dict((name, self.data[name]) for name in ('service_id', 'route_id', 'consumer_id') if name in self.data)
+
+class KongUpstreamApi(KongApi):
+
+    collection = 'upstreams'
+
+    def create(self):
+        # We cannot use our typical request_create function as not all
+        # API end-points have been updated in Kong to support the PUT method.
+        remembered = self.recall('/upstreams/{id}')
+
+        if remembered is not None:
+            return remembered
+
+        exists = self.find()
+
+        if self.module.check_mode:
+            return self.diff(exists, self.simulate(exists, self.expected()))
+
+        if exists['status'] == 200:
+            result = self.request('/upstreams/{id}', 'PATCH', self.data)
+            result['changed'] = self.changed(exists['response'], result['response'])
+        else:
+            result = self.request('/upstreams', 'POST', self.data)
+            result['changed'] = result['status'] == 201
+
+        result['failed'] = result['status'] >= 400
+
+        return self.remember('/upstreams/{id}', self.diff(exists, result))
+
+    def delete(self):
+        return self.request_delete('/upstreams/{id}')
+
+    def find(self):
+        return self.request_read('/upstreams/{id}')
+
+    def health(self):
+        return self.request_read('/upstreams/{id}/health')
+
+    def list(self):
+        return self.request_list('/upstreams', ['id', 'name', 'slots'])
+
+    def weigh(self, weights):
+
+        def apply(item):
+            return self.request('/upstreams/{id}/targets', 'POST', {'target': item[0], 'weight': item[1]}, {'id': self.data['id']})
+
+        errors = [result for result in self.parallel(apply, sorted(weights.items())) if result['status'] >= 400]
+
+        if errors:
+            raise ValueError('Unable to set the weight of a target: ' + str(errors[0]['message']))
+
+    def evaluate(self, destination, before):
+
+        # Wait for the destination targets to become healthy, then until the
+        # interval has passed, before comparing the samples against the
+        # thresholds.
+        params = self.module.params
+        started = time.time()
+
+        def healthy():
+            result = self.request('/upstreams/{id}/health', 'GET')
+            data = result['response'].get('data', []) if result['status'] == 200 else []
+            unhealthy = [item['target'] for item in data if item.get('target') in destination and item.get('health') == 'UNHEALTHY']
+            return len(unhealthy) <= (params.get('max_unhealthy', None) or 0) and result['status'] == 200, unhealthy
+
+        checks = []
+
+        def check():
+            checks.append(healthy())
+            return checks[-1][0]
+
+        self.poll(check, params['interval'])
+        time.sleep(max(0, params['interval'] - (time.time() - started)))
+        after = self.sample()
+        evaluation = {'unhealthy': checks[-1][1], 'reachable': after['reachable'], 'requests': after['requests'] - before['requests']}
+        breach = None
+
+        if not checks[-1][0]:
+            breach = 'Unhealthy targets: ' + ', '.join(checks[-1][1])
+        elif not after['reachable']:
+            breach = 'The database is not reachable'
+
+        if 'responses' in after:
+            responses = after['responses'] - before['responses']
+            count = after['latency_count'] - before['latency_count']
+            evaluation['error_rate'] = (after['errors'] - before['errors']) / responses if responses else 0.0
+            evaluation['latency'] = (after['latency_sum'] - before['latency_sum']) / count if count else 0.0
+            if breach is None and params.get('max_error_rate', None) is not None and evaluation['error_rate'] > params['max_error_rate']:
+                breach = 'The error rate ' + str(evaluation['error_rate']) + ' exceeds ' + str(params['max_error_rate'])
+            if breach is None and params.get('max_latency', None) is not None and evaluation['latency'] > params['max_latency']:
+                breach = 'The upstream latency ' + str(evaluation['latency']) + 'ms exceeds ' + str(params['max_latency']) + 'ms'
+
+        return evaluation, breach
+
+    def shift(self):
+
+        params = self.module.params
+
+        for name in ('source_targets', 'destination_targets'):
+            if not params.get(name, None):
+                raise ValueError('The option "' + name + '" is required')
+
+        source = params['source_targets']
+        destination = params['destination_targets']
+        total = params['total_weight']
+        original = dict((data['target'], data['weight']) for data in self.paginate('/upstreams/{id}/targets'))
+        steps = []
+        breach = None
+
+        for step in [int(step) for step in params['steps']]:
+            weights = {}
+            for target in source:
+                weights[target] = int(round(total * (100 - step) / 100.0 / len(source)))
+            for target in destination:
+                weights[target] = int(round(total * step / 100.0 / len(destination)))
+
+            if self.module.check_mode:
+                steps.append({'step': step, 'weights': weights})
+                continue
+
+            before = self.sample()
+            self.weigh(weights)
+            evaluation, breach = self.evaluate(destination, before)
+            evaluation.update({'step': step, 'weights': weights})
+            steps.append(evaluation)
+
+            if breach is not None:
+                # Restore the weights every target had before the shift.
+                self.weigh(dict((target, original.get(target, 0)) for target in source + destination))
+                break
+
+        return {
+            'message': 'Rolled back: ' + breach if breach else 'OK',
+            'status': 200,
+            'url': self.url('/upstreams/{id}/targets'),
+            'changed': True,
+            'failed': breach is not None,
+            'response': {
+                'steps': steps,
+                'rolled_back': breach is not None,
+                'original': original
+            }
+        }
+
+class KongTargetApi(KongApi):
+
+    def create(self):
+        # We cannot use our typical request_create function as not all
+        # API end-points have been updated in Kong to support the PUT method.
+        # This is probably one of the oddest API endpoints getting around.
+        remembered = self.recall('/upstreams/{upstream_id}/targets/{target}')
+
+        if remembered is not None:
+            return remembered
+
+        exists = self.find()
+
+        if self.module.check_mode:
+            return self.diff(exists, self.simulate(exists, self.expected()))
+
+        # Targets are never updated in place, Kong applies a new weight by
+        # appending a target entry which replaces the previous one.
+        if exists['status'] == 200 and not self.differences(self.expected(), exists['response']):
+            result = exists
+            result['changed'] = False
+        else:
+            result = self.request('/upstreams/{upstream_id}/targets', 'POST', self.data)
+            result['changed'] = result['status'] == 201
+            result['failed'] = result['status'] >= 400
+
+        return self.remember('/upstreams/{upstream_id}/targets/{target}', self.diff(exists, result))
+
+    def delete(self):
+        return self.request_delete('/upstreams/{upstream_id}/targets/{target}')
+
+    def find(self):
+        result = {
+            'message': '404 Not Found',
+            'status': 404,
+            'url': self.url('/upstreams/{upstream_id}/targets'),
+            'response': {},
+            'changed': False,
+            'failed': True,
+        }
+
+        targets = self.request('/upstreams/{upstream_id}/targets', 'GET', self.data)
+
+        if targets['status'] == 200:
+            for data in targets['response']['data']:
+                if data['target'] == self.data['target']:
+                    result['failed'] = False
+                    result['status'] = 200
+                    result['message'] = 'OK'
+                    result['response'] = data
+                    break
+
+        return result
+
+    def healthy(self):
+        if self.module.check_mode:
+            result = self.find()
+            result['changed'] = result['status'] == 200
+            return result
+
+        result = self.request('/upstreams/{upstream_id}/targets/{target}/healthy', 'POST', self.data)
+        result['changed'] = result['status'] == 204
+        result['failed'] = result['status'] >= 400
+
+        return result
+
+    def unhealthy(self):
+        if self.module.check_mode:
+            result = self.find()
+            result['changed'] = result['status'] == 200
+            return result
+
+        result = self.request('/upstreams/{upstream_id}/targets/{target}/unhealthy', 'POST', self.data)
+        result['changed'] = result['status'] == 204
+        result['failed'] = result['status'] >= 400
+
+        return result
+
+    def drain(self):
+
+        params = self.module.params
+        method = params.get('drain_by', None) or 'weight'
+        exists = self.find()
+
+        if exists['status'] != 200 or self.module.check_mode:
+            exists['changed'] = exists['status'] == 200
+            return exists
+
+        if method == 'unhealthy':
+            result = self.unhealthy()
+        else:
+            result = self.request('/upstreams/{upstream_id}/targets', 'POST', {'target': self.data['target'], 'weight': 0})
+            result['failed'] = result['status'] >= 400
+
+        if result['failed']:
+            return result
+
+        samples = []
+
+        def settled():
+            # Kong's connection counters are node wide, so the target is
+            # considered drained once the balancer no longer selects it and
+            # the node is left with at most drain_connections requests.
+            health = self.request('/upstreams/{upstream_id}/health', 'GET')
+            data = health['response'].get('data', []) if health['status'] == 200 else [{}]
+            data = [item for item in data if item.get('target', self.data['target']) == self.data['target']]
+            if method == 'unhealthy':
+                removed = all(item.get('health', None) == 'UNHEALTHY' for item in data)
+            else:
+                removed = all(item.get('weight', None) == 0 for item in data)
+            samples.append(self.sample())
+            return removed and samples[-1]['writing'] <= params['drain_connections']
+
+        drained, duration = self.poll(settled, params['drain_timeout'])
+
+        return {
+            'message': 'OK' if drained else 'The target did not drain within ' + str(params['drain_timeout']) + ' seconds',
+            'status': result['status'],
+            'url': result['url'],
+            'changed': True,
+            'failed': not drained,
+            'response': {
+                'target': self.data['target'],
+                'drain_by': method,
+                'drained': drained,
+                'duration': round(duration, 3),
+                'weight': exists['response'].get('weight', None),
+                'connections': samples[-1]['connections'],
+                'writing': samples[-1]['writing'],
+                'samples': len(samples)
+            }
+        }
+
+    def list(self):
+        return self.request_read('/upstreams/{upstream_id}/targets/all')
+
+class KongCollectionApi(KongApi):
+
+    # Collections in dependency order, parents before their children.
+    collections = ['services', 'routes', 'consumers', 'plugins', 'upstreams', 'targets']
+
+    # The unique name of an entity other than its identifier.
+    names = {
+        'services': 'name',
+        'consumers': 'username',
+        'upstreams': 'name',
+    }
+
+    # Fields referencing the parent entity, either as a nested object or an identifier.
+    foreign = {
+        'routes': {'service': 'services'},
+        'plugins': {'service_id': 'services', 'route_id': 'routes', 'consumer_id': 'consumers'},
+        'targets': {'upstream_id': 'upstreams'},
+    }
+
+    aliases = {
+        'plugins': {'service': 'service_id', 'route': 'route_id', 'consumer': 'consumer_id'},
+        'targets': {'upstream': 'upstream_id'},
+    }
+
+    # Entities which may be declared nested within their parent entity.
+    children = {
+        'services': {'routes': 'service', 'plugins': 'service_id'},
+        'routes': {'plugins': 'route_id'},
+        'consumers': {'plugins': 'consumer_id'},
+        'upstreams': {'targets': 'upstream_id'},
+    }
+
+    # The entity APIs defining the natural keys of each collection.
+    apis = {
+        'services': KongServiceApi,
+        'routes': KongRouteApi,
+        'consumers': KongConsumerApi,
+        'plugins': KongPluginApi,
+        'upstreams': KongUpstreamApi,
+        'targets': KongTargetApi,
+    }
+
+    def naturals_of(self, collection, data):
+
+        # The natural key fields an entity API would look the entity up by,
+        # without constructing the API for a module.
+        api = self.apis[collection].__new__(self.apis[collection])
+        api.data = data
+
+        return tuple(api.naturals())
+
+    def key(self, collection, data):
+
+        if collection == 'targets':
+            return str(data.get('upstream_id')) + ' ' + str(data.get('target'))
+
+        return data.get('id', None)
+
+    def summarize(self, collection, data):
+
+        if collection == 'targets':
+            return {'upstream_id': data.get('upstream_id'), 'target': data.get('target')}
+
+        summary = {'id': data.get('id', None)}
+
+        if collection in self.names:
+            summary[self.names[collection]] = data.get(self.names[collection], None)
+        if collection == 'plugins':
+            summary['name'] = data.get('name', None)
+        if summary['id'] is None:
+            for name in self.naturals_of(collection, data):
+                summary[name] = data.get(name, None)
+
+        return summary
+
+    def normalize(self, collection, data):
+
+        # Convert declared entities into the form returned by the Admin API.
+        data = dict((name, value) for name, value in data.items() if value is not None and name != 'state' and name not in self.children.get(collection, {}))
+
+        for alias, name in self.aliases.get(collection, {}).items():
+            if alias in data:
+                data[name] = data.pop(alias)
+
+        if 'id' in data:
+            data['id'] = self.uuid(str(data['id']))
+
+        for name in self.foreign.get(collection, {}):
+            if name in data:
+                value = data[name]['id'] if isinstance(data[name], dict) else data[name]
+                data[name] = self.uuid(str(value))
+                if collection == 'routes':
+                    data[name] = {'id': data[name]}
+
+        if collection == 'services':
+            data = self.split(data)
+
+        return data
+
+    def declare(self, collection, items, declared, parent=None):
+
+        for item in items or []:
+            data = self.normalize(collection, item)
+
+            if parent is not None:
+                data[parent[0]] = {'id': parent[1]} if collection == 'routes' else parent[1]
+
+            declared.setdefault(collection, []).append((data, item.get('state', 'present') == 'absent'))
+
+            for child, name in self.children.get(collection, {}).items():
+                if child in item:
+                    self.declare(child, item[child], declared, (name, data.get('id', None)))
+
+        return declared
+
+    def open_snapshot(self, path):
+
+        stream = open(path, 'rb')
+
+        if stream.read(2) == b'\x1f\x8b':
+            stream.close()
+            return gzip.open(path, 'rb')
+
+        stream.seek(0)
+
+        return stream
+
+    def snapshot(self, path):
+
+        # Yields every entity of a snapshot written by kong_export, one line
+        # at a time, skipping the header.
+        with self.open_snapshot(path) as stream:
+            for line in stream:
+                line = json.loads(line.decode('utf-8'))
+                if 'type' not in line:
+                    continue
+                if 'key' not in line:
+                    line['key'] = self.key(line['type'], line['data'])
+                yield line
+
+    def stream(self, collection):
+
+        if collection != 'targets':
+            for data in self.paginate('/' + collection):
+                yield data
+            return
+
+        # Targets can only be listed per upstream.
+        for upstream in self.paginate('/upstreams'):
+            for data in self.paginate('/upstreams/{id}/targets', {'id': upstream['id']}):
+                yield data
+
+class KongDriftApi(KongCollectionApi):
+
+    def compare(self, collection, declared):
+
+        # Declarations are tracked by their position. Entities declared
+        # without an id are matched by their name, or by the natural key the
+        # modules identify them by.
+        by_key = {}
+        by_name = {}
+        by_natural = {}
+        absent = set()
+        seen = set()
+        name = self.names.get(collection, None)
+        report = {'added': [], 'removed': [], 'modified': [], 'total': 0}
+
+        for index, (data, remove) in enumerate(declared):
+            key = self.key(collection, data)
+            naturals = self.naturals_of(collection, data)
+            if key is not None:
+                by_key[key] = index
+            if name is not None and data.get(name, None) is not None:
+                by_name[data[name]] = index
+            if key is None and naturals:
+                by_natural[(naturals, self.natural(data, naturals))] = index
+            if remove:
+                absent.add(index)
+
+        for actual in self.stream(collection):
+            report['total'] += 1
+            index = by_key.get(self.key(collection, actual), None)
+
+            if index is None and name is not None:
+                index = by_name.get(actual.get(name, None), None)
+
+            for naturals in set(naturals for naturals, natural in by_natural):
+                if index is None:
+                    index = by_natural.get((naturals, self.natural(actual, naturals)), None)
+
+            if index is None or index in absent:
+                report['added'].append(self.summarize(collection, actual))
+                continue
+
+            seen.add(index)
+            fields = self.differences(declared[index][0], actual)
+
+            if fields:
+                summary = self.summarize(collection, actual)
+                summary['fields'] = fields
+                report['modified'].append(summary)
+
+        for index, (data, remove) in enumerate(declared):
+            if index not in seen and index not in absent:
+                report['removed'].append(self.summarize(collection, data))
+
+        return collection, report
+
+    def drift(self):
+
+        declared = {}
+
+        for collection in self.collections:
+            if self.module.params.get(collection, None) is not None:
+                declared.setdefault(collection, [])
+                self.declare(collection, self.module.params[collection], declared)
+
+        reports = dict(self.parallel(lambda collection: self.compare(collection, declared[collection]), [collection for collection in self.collections if collection in declared]))
+        drift = any(report['added'] or report['removed'] or report['modified'] for report in reports.values())
+
+        return {
+            'message': 'Drift detected' if drift else 'OK',
+            'changed': False,
+            'failed': False,
+            'drift': drift,
+            'response': reports
+        }
+
+class KongExportApi(KongCollectionApi):
+
+    # The number of entities sorted in memory before spilling to disk.
+    chunk = 10000
+
+    def line(self, collection, data):
+
+        return json.dumps({'type': collection, 'key': self.key(collection, data), 'data': data}, sort_keys=True, separators=(',', ':'))
+
+    def spill(self, entries, directory):
+
+        handle, path = tempfile.mkstemp(dir=directory, suffix='.chunk')
+
+        with os.fdopen(handle, 'wb') as stream:
+            for key, line in sorted(entries):
+                stream.write((key + '\t' + line + '\n').encode('utf-8'))
+
+        return path
+
+    def chunks(self, path):
+
+        with open(path, 'rb') as stream:
+            for line in stream:
+                key, line = line.decode('utf-8').rstrip('\n').split('\t', 1)
+                yield key, line
+
+    def spool(self, collection, directory):
+
+        # Every collection is written sorted by key into its own gzip member,
+        # using an external merge sort so memory stays bounded.
+        entries = []
+        chunks = []
+
+        for data in self.stream(collection):
+            entries.append((self.key(collection, data), self.line(collection, data)))
+            if len(entries) >= self.chunk:
+                chunks.append(self.spill(entries, directory))
+                entries = []
+
+        if chunks:
+            if entries:
+                chunks.append(self.spill(entries, directory))
+            entries = heapq.merge(*[self.chunks(chunk) for chunk in chunks])
+        else:
+            entries = sorted(entries)
+
+        handle, path = tempfile.mkstemp(dir=directory, suffix='.jsonl.gz')
+        count = 0
+
+        with os.fdopen(handle, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as stream:
+                for key, line in entries:
+                    stream.write((line + '\n').encode('utf-8'))
+                    count += 1
+
+        for chunk in chunks:
+            os.remove(chunk)
+
+        return collection, path, count
+
+    def export(self):
+
+        path = os.path.expanduser(self.module.params['path'])
+        collections = [collection for collection in self.collections if collection in self.module.params['collections']]
+
+        if self.module.check_mode:
+            return {'message': 'OK (check mode)', 'changed': True, 'failed': False, 'response': {'path': path}}
+
+        node = self.request('/', 'GET')
+
+        if node['status'] >= 400:
+            raise ValueError('Unable to read "' + node['url'] + '": ' + str(node['message']))
+
+        directory = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)))
+
+        try:
+            members = self.parallel(lambda collection: self.spool(collection, directory), collections)
+            header = {
+                'format': 'kong-snapshot',
+                'version': 1,
+                'created_at': int(time.time()),
+                'kong_version': node['response'].get('version', None),
+                'collections': [],
+            }
+            line = 2
+
+            for collection, member, count in members:
+                header['collections'].append({'type': collection, 'count': count, 'line': line})
+                line += count
+
+            # The header is a gzip member of its own, followed by the members
+            # of every collection, which gzip readers treat as one stream.
+            handle, temporary = tempfile.mkstemp(dir=directory, suffix='.jsonl.gz')
+            checksum = hashlib.sha256()
+
+            with os.fdopen(handle, 'wb') as raw:
+                buffer = tempfile.SpooledTemporaryFile()
+                with gzip.GzipFile(fileobj=buffer, mode='wb') as stream:
+                    stream.write((json.dumps(header, sort_keys=True, separators=(',', ':')) + '\n').encode('utf-8'))
+                buffer.seek(0)
+                for source in [buffer] + [open(member, 'rb') for collection, member, count in members]:
+                    with source:
+                        for block in iter(lambda: source.read(65536), b''):
+                            checksum.update(block)
+                            raw.write(block)
+                size = raw.tell()
+
+            os.chmod(temporary, 0o600)
+            os.rename(temporary, path)
+        finally:
+            shutil.rmtree(directory, True)
+
+        return {
+            'message': 'OK',
+            'changed': True,
+            'failed': False,
+            'response': {
+                'path': path,
+                'counts': dict((collection['type'], collection['count']) for collection in header['collections']),
+                'bytes': size,
+                'checksum': 'sha256:' + checksum.hexdigest(),
+            }
+        }
+
+class KongImportApi(KongCollectionApi):
+
+    # Collections applied together, each level depending on the previous ones.
+    levels = [
+        ['services', 'consumers', 'upstreams'],
+        ['routes', 'targets'],
+        ['plugins'],
+    ]
+
+    # The number of entities read from the snapshot before being applied.
+    batch_size = 1000
+
+    def comparable(self, collection, data):
+
+        if collection == 'targets':
+            return {'upstream_id': data.get('upstream_id'), 'target': data.get('target'), 'weight': data.get('weight')}
+
+        return dict((name, value) for name, value in data.items() if name not in ('created_at', 'updated_at'))
+
+    def index(self, collection):
+
+        # Only a fingerprint of every existing entity is kept in memory.
+        index = {}
+
+        for data in self.stream(collection):
+            index[self.key(collection, data)] = self.fingerprint(self.comparable(collection, data))
+
+        return collection, index
+
+    def operation(self, collection, data, exists):
+
+        body = dict((name, value) for name, value in data.items() if name not in ('created_at', 'updated_at'))
+
+        if collection == 'targets':
+            return 'POST', '/upstreams/{upstream_id}/targets', {'upstream_id': data['upstream_id']}, {'target': data['target'], 'weight': data['weight']}
+        if collection in ('plugins', 'upstreams') and exists:
+            return 'PATCH', '/' + collection + '/{id}', {'id': data['id']}, body
+        if collection in ('plugins', 'upstreams'):
+            return 'POST', '/' + collection, {}, body
+
+        return 'PUT', '/' + collection + '/{id}', {'id': data['id']}, body
+
+    def execute(self, operation):
+
+        collection, method, path, fields, data = operation
+        result = self.request(path, method, data, fields)
+
+        if result['status'] >= 400:
+            return collection, {'url': result['url'], 'status': result['status'], 'message': result['message'], 'response': result['response']}
+
+        return collection, None
+
+    def apply(self, operations, report):
+
+        if self.module.check_mode:
+            return
+
+        for collection, error in self.parallel(self.execute, operations):
+            if error is not None:
+                report[collection]['errors'].append(error)
+
+    def restore(self):
+
+        path = os.path.expanduser(self.module.params['path'])
+        collections = self.module.params['collections']
+        report = {}
+
+        for level in self.levels:
+            level = [collection for collection in level if collection in collections]
+
+            if not level:
+                continue
+
+            indexes = dict(self.parallel(self.index, level))
+            operations = []
+
+            for collection in level:
+                report[collection] = {'created': 0, 'updated': 0, 'unchanged': 0, 'errors': []}
+
+            for line in self.snapshot(path):
+                collection = line.get('type', None)
+
+                if collection not in level:
+                    continue
+
+                exists = indexes[collection].get(line['key'], None)
+
+                if exists == self.fingerprint(self.comparable(collection, line['data'])):
+                    report[collection]['unchanged'] += 1
+                    continue
+
+                report[collection]['created' if exists is None else 'updated'] += 1
+                operations.append((collection,) + self.operation(collection, line['data'], exists is not None))
+
+                if len(operations) >= self.batch_size:
+                    self.apply(operations, report)
+                    operations = []
+
+            self.apply(operations, report)
+
+        errors = sum(len(counts['errors']) for counts in report.values())
+        changes = sum(counts['created'] + counts['updated'] for counts in report.values())
+
+        return {
+            'message': str(errors) + ' request(s) failed' if errors else 'OK',
+            'changed': changes - errors > 0,
+            'failed': errors > 0,
+            'response': report
+        }
+
+class KongSnapshotDiffApi(KongCollectionApi):
+
+    def ordered(self, path):
+
+        # A merge join requires both snapshots in the order kong_export
+        # writes them: by collection, then by key.
+        previous = None
+
+        for line in self.snapshot(path):
+            if line['type'] not in self.collections:
+                continue
+            position = (self.collections.index(line['type']), line['key'])
+            if previous is not None and position < previous:
+                raise ValueError('The snapshot "' + path + '" is not sorted by collection and key')
+            previous = position
+            yield position, line
+
+    def fields(self, source, destination):
+
+        source = dict((name, value) for name, value in source.items() if name not in self.ignore and name not in ('created_at', 'updated_at'))
+        destination = dict((name, value) for name, value in destination.items() if name not in self.ignore and name not in ('created_at', 'updated_at'))
+        fields = {}
+
+        for name, difference in self.differences(source, destination).items():
+            fields[name] = {'source': difference['declared'], 'destination': difference['actual']}
+
+        for name in destination:
+            if name not in source and destination[name] is not None:
+                fields[name] = {'source': None, 'destination': destination[name]}
+
+        return fields
+
+    def change(self, kind, line, report, fields=None):
+
+        change = {'type': line['type'], 'key': line['key'], 'change': kind}
+        change.update(self.summarize(line['type'], line['data']))
+
+        if fields is not None:
+            change['fields'] = fields
+
+        report['changes'].append(change)
+        report['counts'].setdefault(line['type'], {'added': 0, 'removed': 0, 'modified': 0})[kind] += 1
+
+    def compare(self):
+
+        source = self.ordered(os.path.expanduser(self.module.params['source']))
+        destination = self.ordered(os.path.expanduser(self.module.params['destination']))
+        left = next(source, None)
+        right = next(destination, None)
+        report = {'changes': [], 'counts': {}}
+
+        while left is not None or right is not None:
+            if right is None or (left is not None and left[0] < right[0]):
+                self.change('removed', left[1], report)
+                left = next(source, None)
+            elif left is None or right[0] < left[0]:
+                self.change('added', right[1], report)
+                right = next(destination, None)
+            else:
+                fields = self.fields(left[1]['data'], right[1]['data'])
+                if fields:
+                    self.change('modified', right[1], report, fields)
+                left = next(source, None)
+                right = next(destination, None)
+
+        return {
+            'message': 'Differences found' if report['changes'] else 'OK',
+            'changed': False,
+            'failed': False,
+            'different': len(report['changes']) > 0,
+            'response': report
+        }